@@ -6,11 +6,13 @@ import os
 import re
 import subprocess
 
+from dimensions import load_clean
+
 @st.cache_data
 def load_data():
-    """Loads the bidding dataset from the pickle file and caches it."""
+    """Loads the bidding dataset from the pickle files, joined with its dimension tables, and caches it."""
     data_path = os.path.join(os.path.dirname(__file__), "contracts_clean.pkl")
-    return pd.read_pickle(data_path)
+    return load_clean(data_path)
 
 # --- Page Configuration ---
 st.set_page_config(page_title="Painel de Licitações", layout="wide")
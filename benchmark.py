@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Callable, List
+
+import numpy as np
+import pandas as pd
+
+from columnar import records_to_dataframe
+
+
+def _best_time(func: Callable[[], Any], repeat: int) -> float:
+    """Returns the fastest of ``repeat`` runs of ``func``, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(func: Callable[[], Any]) -> int:
+    """Returns the peak Python heap allocation of one run of ``func``, in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# --- Page Decoding ---
+def _raw_pages(path: str, page_size: int) -> List[bytes]:
+    """Re-encodes a stored raw dataset as API pages of ``page_size`` records, in valid JSON (no NaN)."""
+    from mock_pncp import load_records
+
+    records = load_records(path)
+    total_pages = -(-len(records) // page_size)
+    return [
+        json.dumps({
+            "data": records[start:start + page_size],
+            "totalPaginas": total_pages,
+            "paginasRestantes": total_pages - start // page_size - 1,
+        }).encode("utf-8")
+        for start in range(0, len(records), page_size)
+    ]
+
+
+def benchmark_decode(path: str = "contracts.pkl", page_size: int = 50, repeat: int = 3) -> Dict[str, Any]:
+    """Compares per-page DataFrames + pd.concat against the paths the crawl takes now.
+
+    Every approach starts from the raw JSON bytes of every page and parses
+    them, so parsing is included: ``frame_per_page`` with ``json.loads`` as
+    the crawl used to, the others as ``_fetch_page`` does now.
+    ``column_builder`` is a crawl with ``resume=False`` (pages kept in
+    memory); ``checkpointed`` is the default crawl, which appends every
+    response body to the checkpoint spool as it came and parses the spool
+    again into the builder.
+    """
+    import fast_json
+    from crawl_checkpoint import CrawlCheckpoint
+    from page_spool import RawPage
+
+    pages = _raw_pages(path, page_size)
+
+    def frame_per_page() -> pd.DataFrame:
+        frames = [pd.DataFrame(json.loads(page)["data"]) for page in pages]
+        return pd.concat(frames, ignore_index=True)
+
+    def column_builder() -> pd.DataFrame:
+        return records_to_dataframe(fast_json.loads(page)["data"] for page in pages)
+
+    def checkpointed() -> pd.DataFrame:
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = CrawlCheckpoint("/v1/contratacoes/proposta", {}, directory=directory)
+            checkpoint.start(page_size, len(pages))
+            for number, page in enumerate(pages, start=1):
+                checkpoint.add_page(number, RawPage(fast_json.loads(page)["data"], page))
+            return checkpoint.spool.to_dataframe()
+
+    approaches = (("frame_per_page", frame_per_page), ("column_builder", column_builder),
+                  ("checkpointed", checkpointed))
+    expected = frame_per_page()
+    for name, func in approaches[1:]:
+        actual = func()
+        if expected.shape != actual.shape or list(expected.columns) != list(actual.columns):
+            raise AssertionError(f"{name} disagrees: {expected.shape} vs {actual.shape}")
+
+    results = {"rows": len(expected), "pages": len(pages), "page_size": page_size}
+    for name, func in approaches:
+        results[name] = {"seconds": _best_time(func, repeat), "peak_bytes": _peak_memory(func)}
+    for name, _ in approaches[1:]:
+        results[name]["speedup"] = results["frame_per_page"]["seconds"] / results[name]["seconds"]
+    return results
+
+
+def print_decode_results(results: Dict[str, Any]):
+    print(f"Decoding {results['rows']} rows from {results['pages']} pages of {results['page_size']}:")
+    for name in ("frame_per_page", "column_builder", "checkpointed"):
+        speedup = results[name].get("speedup")
+        print(f"  {name:<16} {results[name]['seconds']:.3f} s, peak {results[name]['peak_bytes'] / 1_000_000:.1f} MB"
+              + (f", {speedup:.2f}x" if speedup else ""))
+
+
+# --- Nested Column Flattening ---
+def _flatten_json_normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """The flattening process_data used to do: json_normalize + concat, once per column."""
+    for column in ("orgaoEntidade", "unidadeOrgao"):
+        df = pd.concat([df.drop(column, axis=1), pd.json_normalize(df[column])], axis=1)
+    return df
+
+
+def benchmark_flatten(path: str = "contracts.pkl", repeat: int = 3) -> Dict[str, Any]:
+    """Compares json_normalize + concat against the single-pass ``flatten_nested``.
+
+    Both run on the deduplicated raw dataset with a clean RangeIndex, so the
+    old approach is timed at its best (its misalignment only shows up with
+    a gapped index).
+    """
+    from extract import flatten_nested
+
+    raw = pd.read_pickle(path)
+    raw = raw.drop_duplicates(subset=["valorTotalHomologado", "objetoCompra"], ignore_index=True)
+
+    def json_normalize() -> pd.DataFrame:
+        return _flatten_json_normalize(raw)
+
+    def single_pass() -> pd.DataFrame:
+        df = raw.copy(deep=False)
+        for column in ("orgaoEntidade", "unidadeOrgao"):
+            flatten_nested(df, column)
+        return df
+
+    expected, actual = json_normalize(), single_pass()
+    if list(expected.columns) != list(actual.columns) or not expected.astype(str).equals(actual.astype(str)):
+        raise AssertionError("Flattening approaches disagree")
+
+    results = {"rows": len(raw)}
+    for name, func in (("json_normalize", json_normalize), ("single_pass", single_pass)):
+        results[name] = {"seconds": _best_time(func, repeat), "peak_bytes": _peak_memory(func)}
+    results["speedup"] = results["json_normalize"]["seconds"] / results["single_pass"]["seconds"]
+    return results
+
+
+def print_flatten_results(results: Dict[str, Any]):
+    print(f"Flattening orgaoEntidade and unidadeOrgao of {results['rows']} rows:")
+    for name in ("json_normalize", "single_pass"):
+        print(f"  {name:<16} {results[name]['seconds']:.3f} s, peak {results[name]['peak_bytes'] / 1_000_000:.1f} MB")
+    print(f"  speedup: {results['speedup']:.2f}x")
+
+
+# --- Crawl Throughput ---
+CRAWL_MODES = ("sequential", "threads", "async")
+
+
+def _peak_rss() -> int:
+    """Returns this process's peak resident set size, in bytes.
+
+    ``ru_maxrss`` survives exec on Linux, so a spawned child would report its
+    parent's peak; the kernel's per-process high-water mark is used instead
+    when available.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _crawl_run(base_url: str, mode: str, page_size: int, concurrency: int) -> Dict[str, Any]:
+    """Crawls the mock server once; runs in a fresh process so RSS and CPU are its own."""
+    import extract
+    import pncp_http
+
+    extract.BASE_URL = base_url
+    pncp_http.configure_session(pool_maxsize=max(concurrency, 1))
+    pncp_http.reset_request_timings()
+    params = {"dataFinal": "20400618"}  # What extract.main crawls
+    rss_before = _peak_rss()
+
+    cpu_start, start = time.process_time(), time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        if mode == "async":
+            df = asyncio.run(extract.query_all_contracts_async(params, max_concurrency=concurrency,
+                                                               page_size=page_size, resume=False))
+        else:
+            df = extract.query_all_contracts(params, max_workers=1 if mode == "sequential" else concurrency,
+                                             page_size=page_size, resume=False)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+    timings = pncp_http.get_request_timings()
+    latencies = np.array([timing.total for timing in timings]) if timings else np.zeros(1)
+    pages = sum(1 for timing in timings if timing.status == 200)
+    records = 0 if df is None else len(df)
+    return {
+        "mode": mode,
+        "page_size": page_size,
+        "concurrency": 1 if mode == "sequential" else concurrency,
+        "ok": df is not None,
+        "seconds": elapsed,
+        "requests": len(timings),
+        "failed_requests": len(timings) - pages,
+        "pages": pages,
+        "records": records,
+        "pages_per_sec": pages / elapsed,
+        "records_per_sec": records / elapsed,
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p95": float(np.percentile(latencies, 95)),
+        "latency_p99": float(np.percentile(latencies, 99)),
+        "bytes": sum(timing.wire_size for timing in timings),  # As received, before decompression
+        "decoded_bytes": sum(timing.size for timing in timings),
+        "cpu_seconds": cpu,
+        "peak_rss_bytes": _peak_rss(),
+        "baseline_rss_bytes": rss_before,
+    }
+
+
+def benchmark_crawl(modes: List[str], page_sizes: List[int], concurrency_levels: List[int],
+                    data: str = "contracts.pkl", records: int = 0, latency: float = 0.02,
+                    jitter: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0) -> Dict[str, Any]:
+    """Crawls a local mock PNCP server with every mode, page size and concurrency level.
+
+    The mock runs in this process; every crawl runs in a freshly spawned one,
+    so its peak RSS (``ru_maxrss``) and CPU time are not mixed with the
+    server's or with earlier runs. The sequential mode ignores the
+    concurrency levels.
+
+    Args:
+        modes (list): Any of "sequential", "threads" and "async".
+        page_sizes (list): ``tamanhoPagina`` values to crawl with.
+        concurrency_levels (list): Workers (threads) or requests in flight (async).
+        data (str): Raw dataset served by the mock.
+        records (int): Serve only the first ``records`` records; 0 serves all.
+        latency, jitter, error_rate, throttle_rate: Mock server behaviour.
+
+    Returns:
+        The configuration and one result per run.
+    """
+    from mock_pncp import MockConfig, load_records, start_mock_server
+
+    served = load_records(data)
+    if records:
+        served = served[:records]
+    config = MockConfig(latency=latency, jitter=jitter, error_rate=error_rate,
+                        throttle_rate=throttle_rate, retry_after=0)
+    server, base_url = start_mock_server(served, config)
+
+    runs = []
+    context = multiprocessing.get_context("spawn")
+    try:
+        for mode in modes:
+            for page_size in page_sizes:
+                for concurrency in ([1] if mode == "sequential" else concurrency_levels):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        result = pool.submit(_crawl_run, base_url, mode, page_size, concurrency).result()
+                    print_crawl_run(result)
+                    runs.append(result)
+    finally:
+        server.shutdown()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "records_served": len(served),
+        "mock": vars(config),
+        "runs": runs,
+    }
+
+
+def print_crawl_run(run: Dict[str, Any]):
+    print(f"  {run['mode']:<10} size {run['page_size']:>3} x{run['concurrency']:<3} "
+          f"{run['pages_per_sec']:8.1f} pages/s {run['records_per_sec']:9.0f} records/s  "
+          f"p50/p95/p99 {run['latency_p50'] * 1000:.0f}/{run['latency_p95'] * 1000:.0f}/"
+          f"{run['latency_p99'] * 1000:.0f} ms  {run['bytes'] / 1_000_000:.1f} MB received  "
+          f"cpu {run['cpu_seconds']:.2f} s  rss {run['peak_rss_bytes'] / 1_000_000:.0f} MB"
+          f"{'' if run['ok'] else '  FAILED'}")
+
+
+# --- Offline Pipeline ---
+def benchmark_pipeline(archive: str = "pages.jsonl.gz", data_final: str = "20400618",
+                       engine: str = "threads") -> Dict[str, Any]:
+    """Times query_all_contracts -> process_data -> save on a recorded page archive.
+
+    Every request is answered from the archive, so the timings cover
+    decoding, assembly, processing and writing, with no network. Run
+    ``extract.py`` with ``record = True`` first to produce the archive;
+    ``data_final`` must match the dataFinal it was recorded with.
+    """
+    import extract
+    import pncp_http
+
+    replayed = pncp_http.replay_pages(archive)
+    params = {"dataFinal": data_final}
+    try:
+        with tempfile.TemporaryDirectory() as directory, \
+                open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+                contextlib.redirect_stderr(devnull):
+            start = time.perf_counter()
+            raw = extract.query_all_contracts(params, engine=engine, resume=False)
+            fetched = time.perf_counter()
+            clean = extract.process_data(raw.copy()) if raw is not None else None
+            processed = time.perf_counter()
+            if clean is not None:
+                extract.save_clean(clean, os.path.join(directory, "contracts_clean.pkl"))
+            saved = time.perf_counter()
+    finally:
+        pncp_http.stop_replay()
+
+    if raw is None:
+        raise RuntimeError(f"{replayed.misses} requests were not in {archive}; record it with the same parameters")
+    return {
+        "archive": archive,
+        "raw_rows": len(raw),
+        "clean_rows": len(clean),
+        "fetch_seconds": fetched - start,
+        "process_seconds": processed - fetched,
+        "save_seconds": saved - processed,
+        "total_seconds": saved - start,
+    }
+
+
+def print_pipeline_results(results: Dict[str, Any]):
+    print(f"Pipeline on {results['archive']}: {results['raw_rows']} raw rows -> {results['clean_rows']} clean rows")
+    for stage in ("fetch", "process", "save", "total"):
+        print(f"  {stage:<8} {results[f'{stage}_seconds']:.3f} s")
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    """Runs the selected benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmarks for the PNCP extraction pipeline.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    decode = subparsers.add_parser("decode", help="Page decoding: per-page DataFrames vs column builder")
+    decode.add_argument("--data", default="contracts.pkl", help="Raw dataset to re-encode as pages")
+    decode.add_argument("--page-size", type=int, default=50)
+    decode.add_argument("--repeat", type=int, default=3)
+
+    flatten = subparsers.add_parser("flatten", help="Nested column flattening: json_normalize vs single pass")
+    flatten.add_argument("--data", default="contracts.pkl", help="Raw dataset to flatten")
+    flatten.add_argument("--repeat", type=int, default=3)
+
+    crawl = subparsers.add_parser("crawl", help="Crawl throughput against a local mock PNCP server")
+    crawl.add_argument("--modes", default=",".join(CRAWL_MODES), help="Comma-separated subset of " + ", ".join(CRAWL_MODES))
+    crawl.add_argument("--page-sizes", type=_int_list, default=[10, 25, 50])
+    crawl.add_argument("--concurrency", type=_int_list, default=[4, 16, 64])
+    crawl.add_argument("--data", default="contracts.pkl", help="Raw dataset served by the mock")
+    crawl.add_argument("--records", type=int, default=5000, help="Records served; 0 serves the whole dataset")
+    crawl.add_argument("--latency", type=float, default=0.02, help="Seconds added to every mock response")
+    crawl.add_argument("--jitter", type=float, default=0.0)
+    crawl.add_argument("--error-rate", type=float, default=0.0)
+    crawl.add_argument("--throttle-rate", type=float, default=0.0)
+    crawl.add_argument("--output", default="benchmark_crawl.json", help="JSON file that receives the results")
+
+    pipeline = subparsers.add_parser("pipeline", help="End-to-end pipeline time replayed from a page archive")
+    pipeline.add_argument("--archive", default="pages.jsonl.gz", help="Archive recorded by extract.py")
+    pipeline.add_argument("--data-final", default="20400618", help="dataFinal the archive was recorded with")
+    pipeline.add_argument("--engine", default="threads", choices=("threads", "async"))
+
+    args = parser.parse_args()
+    if args.benchmark == "decode":
+        print_decode_results(benchmark_decode(args.data, args.page_size, args.repeat))
+    elif args.benchmark == "flatten":
+        print_flatten_results(benchmark_flatten(args.data, args.repeat))
+    elif args.benchmark == "crawl":
+        modes = args.modes.split(",")
+        unknown = set(modes) - set(CRAWL_MODES)
+        if unknown:
+            parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+        results = benchmark_crawl(modes, args.page_sizes, args.concurrency, args.data, args.records,
+                                  args.latency, args.jitter, args.error_rate, args.throttle_rate)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+    elif args.benchmark == "pipeline":
+        print_pipeline_results(benchmark_pipeline(args.archive, args.data_final, args.engine))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from typing import Dict, Any, Iterable, List, Optional
+
+import pandas as pd
+
+
+class ColumnBuilder:
+    """Accumulates API records directly into per-column lists.
+
+    Building one DataFrame per page and concatenating hundreds of them costs
+    a frame construction, dtype inference and a copy per page. Appending the
+    field values of each page to plain Python lists and building a single
+    DataFrame at the end does that work once. Fields missing from a record
+    (or first seen on a later page) are filled with None.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, List[Any]] = {}
+        self.rows = 0
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def extend(self, records: List[Dict[str, Any]]):
+        """Appends a page of records."""
+        if not records:
+            return
+        keys = dict.fromkeys(records[0])
+        for record in records:
+            if record.keys() != keys.keys():
+                keys.update(dict.fromkeys(record))
+
+        for key in keys:
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.rows
+            column.extend([record.get(key) for record in records])
+
+        self.rows += len(records)
+        for key, column in self.columns.items():
+            if len(column) < self.rows:  # Field absent from this whole page
+                column.extend([None] * (self.rows - len(column)))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Materializes the accumulated columns as one DataFrame."""
+        return pd.DataFrame(self.columns)
+
+    def clear(self):
+        self.columns = {}
+        self.rows = 0
+
+
+def dicts_to_columns(values: List[Any], fields: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+    """Spreads a column of dicts into one list per key, in a single pass.
+
+    Every output list is preallocated to ``len(values)`` and filled by
+    position, so the result lines up with ``values`` whatever the index of
+    the frame they came from. Non-dict values (None, NaN) leave the row
+    empty. Without ``fields`` every key is kept, in order of first
+    appearance, like ``pd.json_normalize`` does for flat dicts.
+    """
+    rows = len(values)
+    columns: Dict[str, List[Any]] = {field: [None] * rows for field in fields or []}
+    for i, value in enumerate(values):
+        if not isinstance(value, dict):
+            continue
+        for key, item in value.items():
+            column = columns.get(key)
+            if column is None:
+                if fields is not None:
+                    continue
+                column = columns[key] = [None] * rows
+            column[i] = item
+    return columns
+
+
+def records_to_dataframe(pages: Iterable[List[Dict[str, Any]]]) -> pd.DataFrame:
+    """Builds one DataFrame from an iterable of record pages."""
+    builder = ColumnBuilder()
+    for records in pages:
+        builder.extend(records)
+    return builder.to_dataframe()
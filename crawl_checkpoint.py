@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, List, Set
+
+from page_spool import PageSpool
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints")
+CHECKPOINT_MAX_AGE = 12 * 60 * 60  # Seconds after which a crawl starts over instead of resuming
+
+
+def checkpoint_key(endpoint: str, params: Dict[str, Any]) -> str:
+    """Returns a stable identifier for a crawl of ``endpoint`` with ``params``."""
+    payload = json.dumps({"endpoint": endpoint, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class CrawlCheckpoint:
+    """Crawl state persisted on disk so an interrupted crawl can resume.
+
+    Two files live under ``directory``:
+
+    * ``<key>.json`` holds the endpoint, parameters, start time, page size
+      and total pages, written once when the crawl starts;
+    * ``<key>.pages.jsonl`` is a ``PageSpool`` with one line per completed
+      page (``pages_path`` can point it elsewhere, e.g. at a crawl's output).
+
+    The spool is the source of truth: a page counts as completed only if its
+    line was fully written, so a crash in the middle of a write just loses
+    that page.
+
+    A checkpoint older than ``max_age`` seconds is not resumed: the result
+    set has moved on since (records published, ``totalPaginas`` grown), and
+    mixing its pages with fresh ones would miss or repeat records.
+    """
+
+    def __init__(self, endpoint: str, params: Dict[str, Any], directory: str = CHECKPOINT_DIR,
+                 pages_path: Optional[str] = None, max_age: float = CHECKPOINT_MAX_AGE):
+        self.endpoint = endpoint
+        self.params = dict(params)
+        self.key = checkpoint_key(endpoint, self.params)
+        self.state_path = os.path.join(directory, f"{self.key}.json")
+        self.spool = PageSpool(pages_path or os.path.join(directory, f"{self.key}.pages.jsonl"))
+        self.max_age = max_age
+        self.started_at: Optional[float] = None
+        self.page_size: Optional[int] = None
+        self.total_pages: Optional[int] = None
+        self.completed: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.state_path)
+
+    def is_stale(self) -> bool:
+        """Tells whether the loaded checkpoint is too old to resume; one without a start time is."""
+        return self.started_at is None or time.time() - self.started_at > self.max_age
+
+    def resume(self) -> Set[int]:
+        """Loads the saved state and returns the completed page numbers."""
+        with open(self.state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        self.started_at = state.get("started_at")
+        self.page_size = state["page_size"]
+        self.total_pages = state["total_pages"]
+        self.completed = set(self.spool.pages())
+        return set(self.completed)
+
+    def start(self, page_size: int, total_pages: int):
+        """Starts a fresh checkpoint, discarding any previous one for the same crawl."""
+        self.clear()
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        self.started_at = time.time()
+        self.page_size = page_size
+        self.total_pages = total_pages
+        self.completed = set()
+        self._write_state()
+
+    def add_page(self, page: int, records: List[Dict[str, Any]]):
+        """Spools a completed page; the spool line is the record of its completion."""
+        with self._lock:
+            self.spool.append(page, records)
+            self.completed.add(page)
+
+    def clear(self, keep_pages: bool = False):
+        """Removes the checkpoint files; ``keep_pages`` leaves the page spool in place."""
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        if not keep_pages:
+            self.spool.clear()
+
+    def _write_state(self):
+        state = {
+            "endpoint": self.endpoint,
+            "params": self.params,
+            "started_at": self.started_at,
+            "page_size": self.page_size,
+            "total_pages": self.total_pages,
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
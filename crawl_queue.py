@@ -0,0 +1,447 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+import pandas as pd
+
+import extract
+from columnar import records_to_dataframe
+from page_spool import PageSpool
+from pncp_endpoints import get_endpoint
+from pncp_http import AIMDController, configure_session
+
+QUEUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawl_queue.db")
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawl_spool")
+LEASE_SECONDS = 120  # A task whose worker stops renewing its lease for this long goes back to the queue
+MAX_ATTEMPTS = 5  # Claims of one task before it is marked as failed
+PAGES_PER_TASK = 50  # Size of the page-range tasks
+WORKER_THREADS = 8  # Pages fetched at the same time inside one worker process
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    params TEXT NOT NULL,
+    page_size INTEGER NOT NULL,
+    first_page INTEGER NOT NULL,
+    last_page INTEGER,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    records INTEGER,
+    error TEXT,
+    updated_at REAL,
+    UNIQUE (endpoint, params, page_size, first_page)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+"""
+
+
+@dataclass
+class Task:
+    """A slice of a crawl: pages ``first_page``..``last_page`` of one endpoint and parameter set.
+
+    ``last_page`` is None for date-window tasks, which crawl every page of
+    their window; the worker fills it in once page 1 reveals ``totalPaginas``.
+    """
+    id: int
+    endpoint: str
+    params: Dict[str, Any]
+    page_size: int
+    first_page: int
+    last_page: Optional[int]
+    attempts: int
+
+    @property
+    def spool_name(self) -> str:
+        """Spool of this attempt; every claim writes its own, so a worker that lost the lease cannot corrupt it."""
+        return self.attempt_spool_name(self.attempts)
+
+    def attempt_spool_name(self, attempt: int) -> str:
+        return f"task-{self.id:06d}.{attempt}.jsonl"
+
+
+class CrawlQueue:
+    """Durable crawl task queue in a SQLite database, with leases.
+
+    A worker claims a task by leasing it for ``lease_seconds`` and renews
+    the lease while it works. If the worker dies, the lease expires and the
+    next claim hands the task to another worker, up to ``MAX_ATTEMPTS``
+    times. Every operation opens its own short-lived connection and runs in
+    one transaction, so any number of threads and processes can share the
+    file. Workers on several hosts need the database on a filesystem with
+    working POSIX locks (SQLite over NFS is not reliable).
+    """
+
+    def __init__(self, path: str = QUEUE_PATH, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(sqlite3.connect(path, timeout=60, isolation_level=None)) as db:
+            db.execute("PRAGMA journal_mode=WAL")  # Readers do not block the claiming writer
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path, timeout=60, isolation_level=None)) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def add(self, endpoint: str, params: Dict[str, Any], page_size: int, first_page: int = 1,
+            last_page: Optional[int] = None) -> bool:
+        """Enqueues a task; returns False if the same task was already planned."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO tasks (endpoint, params, page_size, first_page, last_page, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (endpoint, json.dumps(params, sort_keys=True), page_size, first_page, last_page, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def claim(self, worker: str) -> Optional[Task]:
+        """Leases the next available task to ``worker``, or returns None when none is left."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE tasks SET status = 'failed', error = 'lease expired too many times', updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, endpoint, params, page_size, first_page, last_page, attempts FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row[0]),
+            )
+        return Task(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6] + 1)
+
+    def heartbeat(self, task: Task, worker: str) -> bool:
+        """Renews the lease; returns False if the task was handed to someone else meanwhile."""
+        return self._update_owned(task, worker, "lease_expires = ?", time.time() + self.lease_seconds)
+
+    def set_last_page(self, task: Task, worker: str, last_page: int) -> bool:
+        task.last_page = last_page
+        return self._update_owned(task, worker, "last_page = ?", last_page)
+
+    def complete(self, task: Task, worker: str, records: int) -> bool:
+        return self._update_owned(task, worker, "status = 'done', lease_expires = NULL, records = ?", records)
+
+    def fail(self, task: Task, worker: str, error: str) -> bool:
+        """Gives a task back to the queue, or marks it failed after ``max_attempts`` claims."""
+        status = "failed" if task.attempts >= self.max_attempts else "pending"
+        return self._update_owned(task, worker, f"status = '{status}', lease_expires = NULL, error = ?", error)
+
+    def _update_owned(self, task: Task, worker: str, assignment: str, value: Any) -> bool:
+        with self._transaction() as db:
+            cursor = db.execute(
+                f"UPDATE tasks SET {assignment}, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (value, time.time(), task.id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def status(self) -> Dict[str, int]:
+        """Counts the tasks in each status."""
+        with self._transaction() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def done_tasks(self) -> List[Task]:
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT id, endpoint, params, page_size, first_page, last_page, attempts FROM tasks "
+                "WHERE status = 'done' ORDER BY id"
+            ).fetchall()
+        return [Task(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6]) for row in rows]
+
+
+# --- Planning ---
+def _default_page_size(endpoint: str, page_size: Optional[int]) -> int:
+    return page_size or extract.page_size_limits(endpoint)[1]
+
+
+def plan_page_ranges(queue: CrawlQueue, endpoint: str, params: Dict[str, Any], page_size: Optional[int] = None,
+                     pages_per_task: int = PAGES_PER_TASK) -> int:
+    """Probes page 1 and enqueues the crawl as tasks of ``pages_per_task`` pages.
+
+    Pages shift if records are published while the crawl runs; use date
+    windows for long backfills of live endpoints.
+
+    Returns:
+        The number of new tasks.
+    """
+    spec = get_endpoint(endpoint)
+    spec.validate(params)
+    page_size = _default_page_size(spec.path, page_size)
+    first_page = extract._fetch_page(f"{extract.BASE_URL}{spec.path}", extract._page_params(params, 1, page_size))
+    if first_page is None:
+        raise RuntimeError(f"Could not probe {spec.path} with {params}")
+    total_pages = first_page[2]
+    return sum(
+        queue.add(spec.path, params, page_size, start, min(start + pages_per_task - 1, total_pages))
+        for start in range(1, total_pages + 1, pages_per_task)
+    )
+
+
+def date_windows(start: str, end: str, days: int) -> List[Tuple[str, str]]:
+    """Splits the inclusive yyyyMMdd range ``start``..``end`` into windows of ``days`` days."""
+    current, last = datetime.strptime(start, "%Y%m%d"), datetime.strptime(end, "%Y%m%d")
+    windows = []
+    while current <= last:
+        window_end = min(current + timedelta(days=days - 1), last)
+        windows.append((current.strftime("%Y%m%d"), window_end.strftime("%Y%m%d")))
+        current = window_end + timedelta(days=1)
+    return windows
+
+
+def plan_date_windows(queue: CrawlQueue, endpoint: str, params: Dict[str, Any], start: str, end: str,
+                      days: int = 7, page_size: Optional[int] = None) -> int:
+    """Enqueues one task per ``days``-day window of dataInicial/dataFinal.
+
+    Returns:
+        The number of new tasks.
+    """
+    spec = get_endpoint(endpoint)
+    page_size = _default_page_size(spec.path, page_size)
+    added = 0
+    for window_start, window_end in date_windows(start, end, days):
+        window_params = dict(params, dataInicial=window_start, dataFinal=window_end)
+        spec.validate(window_params)
+        added += queue.add(spec.path, window_params, page_size)
+    return added
+
+
+# --- Workers ---
+class _LeaseKeeper:
+    """Renews a task's lease on a background thread while the worker fetches it."""
+
+    def __init__(self, queue: CrawlQueue, task: Task, worker: str):
+        self.queue, self.task, self.worker = queue, task, worker
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(self.task, self.worker):
+                self.lost.set()
+                return
+
+
+def run_task(queue: CrawlQueue, task: Task, worker: str, spool_dir: str = SPOOL_DIR,
+             max_workers: int = WORKER_THREADS, lost: Optional[threading.Event] = None) -> Optional[int]:
+    """Fetches a task's pages into the spool of this attempt under ``spool_dir``.
+
+    Pages fully written by earlier, interrupted attempts are copied over
+    instead of being fetched again. When ``lost`` is set (the lease went to
+    another worker), no further page is fetched or written.
+
+    Returns:
+        The number of records in the spool, or None if a page could not be
+        fetched or the lease was lost.
+    """
+    url = f"{extract.BASE_URL}{task.endpoint}"
+    min_page_size = extract.page_size_limits(task.endpoint)[0]
+    lost = lost or threading.Event()
+    spool = PageSpool(os.path.join(spool_dir, task.spool_name))
+    done = set(spool.pages())
+    for attempt in range(1, task.attempts):
+        for page, records in PageSpool(os.path.join(spool_dir, task.attempt_spool_name(attempt))).iter_pages():
+            if page not in done:
+                spool.append(page, records)
+                done.add(page)
+
+    if task.last_page is None:
+        if task.first_page not in done:
+            first_page = extract._fetch_page(url, extract._page_params(task.params, task.first_page, task.page_size))
+            if first_page is None or lost.is_set():
+                return None
+            spool.append(task.first_page, first_page[0])
+            done.add(task.first_page)
+            total_pages = first_page[2]
+        else:
+            probe = extract._fetch_page(url, extract._page_params(task.params, 1, task.page_size))
+            if probe is None:
+                return None
+            total_pages = probe[2]
+        queue.set_last_page(task, worker, max(total_pages, task.first_page))
+
+    controller = AIMDController(initial=extract.INITIAL_CONCURRENCY, maximum=max_workers)
+    pending = [page for page in range(task.first_page, task.last_page + 1) if page not in done]
+    failed = False
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(extract._fetch_page_adaptive, url, task.params, page, task.page_size,
+                            min_page_size, controller): page
+            for page in pending
+        }
+        for future in as_completed(futures):
+            if lost.is_set():
+                for other in futures:
+                    other.cancel()
+                break
+            records = future.result()
+            if records is None:
+                failed = True
+            else:
+                spool.append(futures[future], records)
+    if failed or lost.is_set():
+        return None
+    return sum(len(records) for _, records in spool.iter_pages())
+
+
+def run_worker(queue_path: str = QUEUE_PATH, spool_dir: str = SPOOL_DIR, worker: Optional[str] = None,
+               lease_seconds: float = LEASE_SECONDS, max_workers: int = WORKER_THREADS) -> int:
+    """Claims and runs tasks until the queue has none left.
+
+    Returns:
+        The number of tasks this worker completed.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = CrawlQueue(queue_path, lease_seconds)
+    os.makedirs(spool_dir, exist_ok=True)
+    configure_session(pool_maxsize=max_workers)
+    completed = 0
+    while True:
+        task = queue.claim(worker)
+        if task is None:
+            return completed
+        print(f"[{worker}] Task {task.id}: {task.endpoint} {task.params} pages {task.first_page}-{task.last_page or '?'}")
+        with _LeaseKeeper(queue, task, worker) as lease:
+            try:
+                records = run_task(queue, task, worker, spool_dir, max_workers, lease.lost)
+            except Exception as e:
+                print(f"[{worker}] Task {task.id} crashed: {e}")
+                queue.fail(task, worker, repr(e))
+                continue
+        if lease.lost.is_set():
+            print(f"[{worker}] Lost the lease on task {task.id}; leaving it to its new owner.")
+        elif records is None:
+            queue.fail(task, worker, "pages could not be fetched")
+        elif queue.complete(task, worker, records):
+            completed += 1
+            for attempt in range(1, task.attempts):  # Only the completed attempt's spool is collected
+                stale = os.path.join(spool_dir, task.attempt_spool_name(attempt))
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+
+def run_workers(processes: int, queue_path: str = QUEUE_PATH, spool_dir: str = SPOOL_DIR,
+                lease_seconds: float = LEASE_SECONDS, max_workers: int = WORKER_THREADS) -> Dict[str, int]:
+    """Runs ``processes`` worker processes on this machine until the queue is drained."""
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_worker, args=(queue_path, spool_dir, None, lease_seconds, max_workers))
+        for _ in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    return CrawlQueue(queue_path).status()
+
+
+def collect(queue_path: str = QUEUE_PATH, spool_dir: str = SPOOL_DIR) -> pd.DataFrame:
+    """Assembles the spools of every completed task, in task order, dropping repeated records."""
+    tasks = CrawlQueue(queue_path).done_tasks()
+    spools = (PageSpool(os.path.join(spool_dir, task.spool_name)) for task in tasks)
+    df = records_to_dataframe(records for spool in spools for _, records in spool.iter_pages())
+    if extract.RECORD_KEY in df.columns:
+        df = df.drop_duplicates(subset=extract.RECORD_KEY, keep="last", ignore_index=True)
+    return df
+
+
+def _parse_params(endpoint: str, pairs: List[str]) -> Dict[str, Any]:
+    """Parses ``name=value`` pairs, converting only the parameters the endpoint declares as integers.
+
+    String parameters such as ``cnpj`` and ``codigoUnidadeAdministrativa``
+    keep their leading zeros.
+    """
+    parameters = get_endpoint(endpoint).parameters
+    params: Dict[str, Any] = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        parameter = parameters.get(name)
+        is_integer = parameter is not None and parameter.type == "integer" and value.isdigit()
+        params[name] = int(value) if is_integer else value
+    return params
+
+
+def main():
+    """Command line entry point: plan, work, status, collect."""
+    parser = argparse.ArgumentParser(description="Distributed PNCP crawl over a SQLite task queue.")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="SQLite queue file (shared between hosts)")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="Directory receiving the task spools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pages = commands.add_parser("plan-pages", help="Split one crawl into page-range tasks")
+    windows = commands.add_parser("plan-windows", help="Split a date range into window tasks")
+    for command in (pages, windows):
+        command.add_argument("endpoint", help="Endpoint path or name, e.g. contratos")
+        command.add_argument("params", nargs="*", help="Query parameters as name=value")
+        command.add_argument("--page-size", type=int)
+    pages.add_argument("--pages-per-task", type=int, default=PAGES_PER_TASK)
+    windows.add_argument("--start", required=True, help="yyyyMMdd")
+    windows.add_argument("--end", required=True, help="yyyyMMdd")
+    windows.add_argument("--days", type=int, default=7)
+
+    work = commands.add_parser("work", help="Run worker processes until the queue is drained")
+    work.add_argument("--processes", type=int, default=4)
+    work.add_argument("--threads", type=int, default=WORKER_THREADS, help="Pages in flight per process")
+    work.add_argument("--lease", type=float, default=LEASE_SECONDS)
+
+    commands.add_parser("status", help="Count tasks by status")
+    output = commands.add_parser("collect", help="Merge the completed spools into CSV and pickle files")
+    output.add_argument("--output", default="contracts", help="Output file name without extension")
+
+    args = parser.parse_args()
+    queue = CrawlQueue(args.queue)
+    if args.command == "plan-pages":
+        params = _parse_params(args.endpoint, args.params)
+        added = plan_page_ranges(queue, args.endpoint, params, args.page_size, args.pages_per_task)
+        print(f"Planned {added} new tasks.")
+    elif args.command == "plan-windows":
+        params = _parse_params(args.endpoint, args.params)
+        added = plan_date_windows(queue, args.endpoint, params, args.start, args.end, args.days, args.page_size)
+        print(f"Planned {added} new tasks.")
+    elif args.command == "work":
+        print(f"Queue: {run_workers(args.processes, args.queue, args.spool_dir, args.lease, args.threads)}")
+    elif args.command == "status":
+        print(f"Queue: {queue.status()}")
+    elif args.command == "collect":
+        df = collect(args.queue, args.spool_dir)
+        extract.save_to_csv(df, f"{args.output}.csv")
+        extract.save_to_pickle(df, f"{args.output}.pkl")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import hashlib
+import os
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEDUP_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contracts_dedup.npy")
+DEDUP_KEY = ("numeroControlePNCP",)  # Columns two records must share to count as duplicates
+
+
+def fingerprints(df: pd.DataFrame, key: Sequence[str] = DEDUP_KEY) -> np.ndarray:
+    """Returns a 64-bit fingerprint of every row's ``key`` columns.
+
+    The hash is salted with the column names, so fingerprints taken with a
+    different key never match.
+    """
+    salt = hashlib.md5("|".join(key).encode("utf-8")).hexdigest()[:16]
+    return pd.util.hash_pandas_object(df[list(key)], index=False, hash_key=salt).to_numpy()
+
+
+def _sorted_contains(haystack: np.ndarray, needles: np.ndarray) -> np.ndarray:
+    """Tells which ``needles`` are in the sorted array ``haystack``."""
+    if not len(haystack):
+        return np.zeros(len(needles), dtype=bool)
+    positions = np.searchsorted(haystack, needles).clip(max=len(haystack) - 1)
+    return haystack[positions] == needles
+
+
+class DedupIndex:
+    """Set of record fingerprints seen so far, persisted as a sorted ``uint64`` array.
+
+    The file is a plain ``.npy`` array, 8 bytes per record, memory-mapped on
+    load, so checking a batch costs a binary search per new row and never
+    reads the whole index. Additions and removals are kept in memory until
+    ``save`` writes the merged array back.
+    """
+
+    def __init__(self, path: Optional[str] = None, key: Sequence[str] = DEDUP_KEY):
+        self.path = path
+        self.key = tuple(key)
+        self._stored = np.empty(0, dtype=np.uint64)
+        self._added = np.empty(0, dtype=np.uint64)
+        self._removed = np.empty(0, dtype=np.uint64)
+        if path is not None and os.path.exists(path):
+            self._stored = np.load(path, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._stored) - len(self._removed) + len(self._added)
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        """Tells which fingerprints are in the index."""
+        found = _sorted_contains(self._stored, values)
+        if len(self._removed):
+            found &= ~_sorted_contains(self._removed, values)
+        if len(self._added):
+            found |= _sorted_contains(self._added, values)
+        return found
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.uint64)
+        self._removed = np.setdiff1d(self._removed, values)
+        self._added = np.union1d(self._added, values[~_sorted_contains(self._stored, values)])
+
+    def discard(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.uint64)
+        self._added = np.setdiff1d(self._added, values)
+        self._removed = np.union1d(self._removed, values[_sorted_contains(self._stored, values)])
+
+    def rebuild(self, values: np.ndarray):
+        """Replaces the whole content with ``values``; ``save`` writes it."""
+        self._stored = np.empty(0, dtype=np.uint64)
+        self._removed = np.empty(0, dtype=np.uint64)
+        self._added = np.unique(np.asarray(values, dtype=np.uint64))
+
+    def drop_seen(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Removes the rows already in the index or repeated within ``df``, and adds the rest.
+
+        Of rows repeated within ``df``, the first is kept.
+        """
+        values = fingerprints(df, self.key)
+        new = ~self.contains(values) & ~pd.Series(values).duplicated().to_numpy()
+        self.add(values[new])
+        if new.all():
+            return df.reset_index(drop=True)
+        return df[new].reset_index(drop=True)
+
+    def save(self, path: Optional[str] = None):
+        """Writes the index, with its pending changes, and maps the new file."""
+        path = path or self.path
+        merged = np.union1d(np.setdiff1d(self._stored, self._removed, assume_unique=True), self._added)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, merged.astype(np.uint64))
+        self._stored = np.empty(0, dtype=np.uint64)  # Release the old mapping before replacing the file
+        os.replace(tmp_path, path)
+        self.path = path
+        self._stored = np.load(path, mmap_mode="r")
+        self._added = np.empty(0, dtype=np.uint64)
+        self._removed = np.empty(0, dtype=np.uint64)
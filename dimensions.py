@@ -0,0 +1,108 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class Dimension:
+    """Columns of the clean dataset that describe one entity, stored once per distinct entity.
+
+    The fact table keeps only ``key``, the row number of the entity in the
+    dimension table. ``natural_key`` is the PNCP identifier the table is
+    sorted by; an entity whose other attributes changed over time (a
+    renamed órgão) has one row per version.
+    """
+    name: str
+    key: str
+    natural_key: str
+    columns: List[str]
+
+
+DIMENSIONS = [
+    Dimension("orgaos", "orgaoId", "cnpj", ["cnpj", "razaoSocial", "poderId", "esferaId", "poder"]),
+    # codigoUnidade is only unique within an órgão, so unidades sharing a code are distinct rows
+    Dimension("unidades", "unidadeId", "codigoUnidade",
+              ["ufNome", "codigoIbge", "ufSigla", "municipioNome", "codigoUnidade", "nomeUnidade"]),
+    Dimension("amparos", "amparoLegalId", "amparoLegalCodigo",
+              ["amparoLegalCodigo", "amparoLegalNome", "amparoLegalDescricao"]),
+]
+
+
+def split_dimensions(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """Moves the dimension columns of a clean dataset into their own tables.
+
+    Dimensions whose columns are not all in ``df`` are left in place.
+
+    Returns:
+        The fact table, with an integer key column per dimension instead of
+        its columns, and the dimension tables by name.
+    """
+    fact = df.copy(deep=False)
+    tables = {}
+    for dimension in DIMENSIONS:
+        if not set(dimension.columns) <= set(fact.columns):
+            continue
+        attributes = fact[dimension.columns]
+        codes, _ = pd.factorize(pd.util.hash_pandas_object(attributes, index=False))
+        table = attributes[~pd.Series(codes).duplicated().to_numpy()]  # Row i is the entity with code i
+        order = np.argsort(table[dimension.natural_key].to_numpy(dtype=str), kind="stable")
+        renumber = np.empty(len(order), dtype=np.int64)
+        renumber[order] = np.arange(len(order))
+        fact = fact.drop(columns=dimension.columns)
+        fact[dimension.key] = pd.to_numeric(renumber[codes], downcast="integer")
+        tables[dimension.name] = table.iloc[order].reset_index(drop=True)
+    return fact, tables
+
+
+def join_dimensions(fact: pd.DataFrame, tables: Dict[str, pd.DataFrame],
+                    names: Optional[List[str]] = None) -> pd.DataFrame:
+    """Puts the columns of the dimension tables back next to the facts.
+
+    Args:
+        fact (pandas.DataFrame): Table from ``split_dimensions``.
+        tables (dict): Dimension tables by name.
+        names (list): Dimensions to join; every one in ``tables`` when omitted.
+
+    Returns:
+        A new frame with each joined dimension's key replaced by its columns.
+    """
+    df = fact.copy(deep=False)
+    for dimension in DIMENSIONS:
+        if dimension.name not in tables or (names is not None and dimension.name not in names):
+            continue
+        if dimension.key not in df.columns:
+            continue
+        rows = tables[dimension.name].take(df[dimension.key].to_numpy())
+        df = df.drop(columns=dimension.key)
+        for column in dimension.columns:
+            df[column] = rows[column].array
+    return df
+
+
+def dimension_path(path: str, name: str) -> str:
+    """``contracts_clean.pkl`` -> ``contracts_clean_orgaos.pkl``."""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_{name}{extension}"
+
+
+def load_tables(path: str) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """Reads a fact table pickle and the dimension tables saved next to it."""
+    fact = pd.read_pickle(path)
+    tables = {
+        dimension.name: pd.read_pickle(dimension_path(path, dimension.name))
+        for dimension in DIMENSIONS
+        if dimension.key in fact.columns and os.path.exists(dimension_path(path, dimension.name))
+    }
+    return fact, tables
+
+
+def load_clean(path: str) -> pd.DataFrame:
+    """Reads a clean dataset saved as fact and dimension tables, joined back into one frame.
+
+    A pickle saved before the split is returned as it is.
+    """
+    fact, tables = load_tables(path)
+    return join_dimensions(fact, tables)
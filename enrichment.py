@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+
+import aiohttp
+import pandas as pd
+from tqdm import tqdm
+
+from pncp_http import REQUEST_TIMEOUT, AIMDController, async_http_get_with_retry, create_async_session
+
+DETAIL_ENDPOINT = "/v1/orgaos/{cnpj}/compras/{ano}/{sequencial}"
+DETAIL_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "details.jsonl")
+ENRICH_CONCURRENCY = 16  # Hard cap on detail requests in flight
+RECORD_KEY = "numeroControlePNCP"
+VERSION_COLUMN = "dataAtualizacaoGlobal"  # A record whose value changed is fetched again
+
+# Fields of RecuperarCompraDTO (detail) that RecuperarCompraPublicacaoDTO (list) does not carry
+DETAIL_FIELDS = [
+    "indicadorOrcamentoSigiloso",
+    "orcamentoSigilosoCodigo",
+    "orcamentoSigilosoDescricao",
+    "existeResultado",
+]
+
+
+class DetailCache:
+    """Persistent cache of detail responses, one JSONL line per fetch.
+
+    Each line is ``{"key": ..., "version": ..., "detail": {...}}`` where
+    ``version`` is the record's ``dataAtualizacaoGlobal`` when it was
+    fetched. Lines are appended as responses arrive, so an interrupted run
+    keeps what it fetched; the last line for a key wins, and ``compact``
+    rewrites the file with one line per key.
+    """
+
+    def __init__(self, path: str = DETAIL_CACHE_PATH):
+        self.path = path
+        self.entries: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._appended = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # Line cut short by a crash
+                        continue
+                    self.entries[entry["key"]] = (entry["version"], entry["detail"])
+
+    def get(self, key: str, version: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached detail of ``key`` if it was fetched for this version."""
+        entry = self.entries.get(key)
+        return entry[1] if entry is not None and entry[0] == version else None
+
+    def put(self, key: str, version: str, detail: Dict[str, Any]):
+        line = json.dumps({"key": key, "version": version, "detail": detail}, ensure_ascii=False)
+        with self._lock:
+            self.entries[key] = (version, detail)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._appended += 1
+
+    def compact(self):
+        """Rewrites the file with only the latest line of every key, if lines were appended."""
+        if not self._appended:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, (version, detail) in self.entries.items():
+                f.write(json.dumps({"key": key, "version": version, "detail": detail}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._appended = 0
+
+
+def detail_targets(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns the key, version and detail path parameters of every record.
+
+    Works on raw records (``orgaoEntidade`` still nested) and on the output
+    of ``process_data`` (flattened ``cnpj`` column).
+    """
+    if "cnpj" in df.columns:
+        cnpj = df["cnpj"]
+    else:
+        cnpj = df["orgaoEntidade"].map(lambda orgao: orgao.get("cnpj") if isinstance(orgao, dict) else None)
+    versions = pd.to_datetime(df[VERSION_COLUMN], errors="coerce").dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return pd.DataFrame({
+        "key": df[RECORD_KEY].to_numpy(),
+        "version": versions.fillna("").to_numpy(),
+        "cnpj": cnpj.to_numpy(),
+        "ano": df["anoCompra"].to_numpy(),
+        "sequencial": df["sequencialCompra"].to_numpy(),
+    })
+
+
+def enrich_details(df: pd.DataFrame, base_url: str, cache_path: str = DETAIL_CACHE_PATH,
+                   max_concurrency: int = ENRICH_CONCURRENCY) -> pd.DataFrame:
+    """Adds the detail-only fields to every record.
+
+    Only records that are not in the cache, or whose ``dataAtualizacaoGlobal``
+    changed since they were cached, are fetched; at most ``max_concurrency``
+    requests are in flight, and an AIMD controller backs off below that when
+    the server throttles. Records whose detail could not be fetched get
+    empty detail fields and are retried on the next run.
+
+    Args:
+        df (pandas.DataFrame): Records to enrich, raw or processed.
+        base_url (str): Root of the consulta API.
+        cache_path (str): JSONL file holding the fetched details.
+        max_concurrency (int): Maximum detail requests in flight.
+
+    Returns:
+        A copy of ``df`` with the ``DETAIL_FIELDS`` columns.
+    """
+    cache = DetailCache(cache_path)
+    targets = detail_targets(df)
+    missing = [
+        target for target in targets.itertuples(index=False)
+        if isinstance(target.cnpj, str) and pd.notna(target.ano) and pd.notna(target.sequencial)
+        and cache.get(target.key, target.version) is None
+    ]
+    print(f"Enriching {len(targets)} records: {len(targets) - len(missing)} cached, {len(missing)} to fetch.")
+    if missing:
+        failed = asyncio.run(_fetch_details(missing, base_url, cache, max_concurrency))
+        if failed:
+            print(f"Could not fetch {failed} details; they will be retried on the next run.")
+    cache.compact()
+
+    details = [cache.get(key, version) or {} for key, version in zip(targets["key"], targets["version"])]
+    enriched = df.copy()
+    for field in DETAIL_FIELDS:
+        enriched[field] = [detail.get(field) for detail in details]
+    return enriched
+
+
+async def _fetch_details(targets: List[Any], base_url: str, cache: DetailCache, max_concurrency: int) -> int:
+    """Fetches and caches the details of ``targets``; returns how many failed."""
+    controller = AIMDController(initial=min(4, max_concurrency), maximum=max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pbar = tqdm(total=len(targets), desc="Fetching details", unit="record")
+
+    async def fetch(session: aiohttp.ClientSession, target) -> bool:
+        url = base_url + DETAIL_ENDPOINT.format(cnpj=target.cnpj, ano=int(target.ano),
+                                                sequencial=int(target.sequencial))
+        try:
+            response = await async_http_get_with_retry(session, url, timeout=REQUEST_TIMEOUT,
+                                                       controller=controller, semaphore=semaphore)
+            response.raise_for_status()
+            cache.put(target.key, target.version, response.json())
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Error fetching detail of {target.key}: {e}")
+            return False
+        finally:
+            pbar.update(1)
+
+    try:
+        async with create_async_session(max_concurrency) as session:
+            results = await asyncio.gather(*(fetch(session, target) for target in targets))
+    finally:
+        pbar.close()
+    return results.count(False)
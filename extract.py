@@ -1,76 +1,475 @@
+import asyncio
+import json
+import os
+import time
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import aiohttp
+import numpy as np
 import requests
 import pandas as pd
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Set, Tuple
 from tqdm import tqdm
 
-BASE_URL = "https://pncp.gov.br/api/consulta"
+import fast_json
+from columnar import dicts_to_columns, records_to_dataframe
+from crawl_checkpoint import CrawlCheckpoint
+from dedup_index import DEDUP_INDEX_PATH, DedupIndex, fingerprints
+from dimensions import dimension_path, load_clean, split_dimensions
+from enrichment import VERSION_COLUMN, enrich_details
+from page_spool import PageSpool, RawPage
+from pncp_endpoints import API_DOCS_PATH, get_endpoint, load_endpoints
+from pncp_http import (
+    MAX_RETRIES,
+    REQUEST_TIMEOUT,
+    AIMDController,
+    async_http_get_with_retry,
+    configure_cache,
+    configure_session,
+    create_async_session,
+    http_get_with_retry,
+    print_timing_summary,
+    record_pages,
+    replay_pages,
+)
+
+BASE_URL = os.environ.get("PNCP_BASE_URL", "https://pncp.gov.br/api/consulta")  # Point at mock_pncp.py for offline runs
 ENDPOINT = "/v1/contratacoes/proposta"
-PAGE_SIZE = 50  # Fetch items per page to reduce the number of requests
+UPDATES_ENDPOINT = "/v1/contratacoes/atualizacao"
+DEFAULT_PAGE_SIZE = 50  # Used for endpoints whose tamanhoPagina limits are not in api-docs.json
+SLOW_PAGE_SECONDS = 10  # A first page slower than this makes the crawl back off to smaller pages
+MAX_WORKERS = 16  # Upper bound on pages fetched concurrently once totalPaginas is known
+INITIAL_CONCURRENCY = 4  # Starting point of the adaptive concurrency limit
+ASYNC_MAX_CONCURRENCY = 64  # Page requests kept in flight by the asyncio engine
+SHARD_WORKERS = 4  # Shards crawled at the same time by the sharded crawl
+PROCESS_CHUNK_ROWS = 50_000  # Raw rows handed to each process_data worker at a time
+MAX_WINDOW_PAGES = 50  # Date windows deeper than this are bisected by the windowed crawl
+RAW_SPOOL_PATH = "contracts.jsonl"  # Raw pages written by the streaming crawl
+SYNC_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sync_state.json")
+RECORD_KEY = "numeroControlePNCP"  # Unique identifier of a contratação in PNCP
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"  # Layout of every PNCP timestamp, e.g. 2027-06-18T17:30:00
+LOCAL_TIMEZONE = "America/Sao_Paulo"  # PNCP timestamps are naive Brasília time
+DATE_COLUMNS = [
+    "dataAberturaProposta",
+    "dataEncerramentoProposta",
+    "dataInclusao",
+    "dataPublicacaoPncp",
+    "dataAtualizacao",
+    "dataAtualizacaoGlobal",
+]
+# Low-cardinality text columns of the clean dataset, stored as categoricals
+CATEGORY_COLUMNS = [
+    "situacaoCompraNome",
+    "modalidadeNome",
+    "modoDisputaNome",
+    "tipoInstrumentoConvocatorioNome",
+    "usuarioNome",
+    "poderId",
+    "poder",
+    "esferaId",
+    "ufSigla",
+    "ufNome",
+    "municipioNome",
+]
+BOOLEAN_COLUMNS = ["srp"]
+
+UFS = [
+    "AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS", "MT", "PA",
+    "PB", "PE", "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC", "SE", "SP", "TO",
+]
+
+# codigoModalidadeContratacao values accepted by the API
+MODALIDADES = {
+    1: "Leilão - Eletrônico",
+    2: "Diálogo Competitivo",
+    3: "Concurso",
+    4: "Concorrência - Eletrônica",
+    5: "Concorrência - Presencial",
+    6: "Pregão - Eletrônico",
+    7: "Pregão - Presencial",
+    8: "Dispensa",
+    9: "Inexigibilidade",
+    10: "Manifestação de Interesse",
+    11: "Pré-qualificação",
+    12: "Credenciamento",
+    13: "Leilão - Presencial",
+}
+
 
-def query_all_contracts(params: Dict[str, Any]) -> Optional[pd.DataFrame]:
+def query_all_contracts(params: Dict[str, Any], max_workers: int = MAX_WORKERS,
+                        engine: str = "threads", endpoint: str = ENDPOINT,
+                        page_size: Optional[int] = None, resume: bool = True) -> Optional[pd.DataFrame]:
     """
     Queries all pages of contracts from the API for the given parameters
     and returns the data in a single pandas DataFrame.
 
+    The first page is fetched on its own to learn ``totalPaginas``; the
+    remaining pages are then fetched concurrently by a bounded worker pool
+    and reassembled in page order. An AIMD controller adjusts how many of the
+    workers may have a request in flight, and pages that still fail after
+    their retries get one more sequential pass before the crawl gives up.
+
+    Completed pages are streamed to a checkpoint spool on disk as they
+    arrive instead of being held in memory; rerunning with the same
+    parameters after a crash fetches only the missing pages.
+
     Args:
         params (dict): Dictionary with the request parameters.
+        max_workers (int): Maximum number of pages fetched at the same time.
+        engine (str): "threads" for the requests-based worker pool or "async"
+            to run the same crawl on the asyncio engine.
+        endpoint (str): API path to crawl.
+        page_size (int): Fixed page size. When omitted it is chosen adaptively,
+            starting at the endpoint's maximum from api-docs.json.
+        resume (bool): Whether to checkpoint the crawl and resume a previous one.
 
     Returns:
         A single DataFrame with all contract data, or None in case of an error.
     """
-    url = f"{BASE_URL}{ENDPOINT}"
-    all_data: List[pd.DataFrame] = []
-    page = 1
-    total_pages = None
-    pbar = None
+    if engine == "async":
+        return asyncio.run(query_all_contracts_async(params, endpoint=endpoint, page_size=page_size,
+                                                     resume=resume))
+    if engine != "threads":
+        raise ValueError(f"Unknown fetch engine: {engine}")
+
+    progress = _CrawlProgress(CrawlCheckpoint(endpoint, params) if resume else None)
+    if not _run_crawl(params, max_workers, endpoint, page_size, progress):
+        return None
+    df = progress.to_dataframe()
+    progress.discard()
+    return df
+
+
+def crawl_to_spool(params: Dict[str, Any], spool_path: str, max_workers: int = MAX_WORKERS,
+                   engine: str = "threads", endpoint: str = ENDPOINT,
+                   page_size: Optional[int] = None) -> Optional[PageSpool]:
+    """Crawls every page straight into a JSONL spool without building a DataFrame.
+
+    Peak memory stays around the pages in flight. The spool doubles as the
+    crawl checkpoint, so rerunning after a crash resumes it.
+
+    Args:
+        params (dict): Dictionary with the request parameters.
+        spool_path (str): JSONL file that receives the pages.
+        max_workers (int): Maximum number of pages fetched at the same time.
+        engine (str): "threads" or "async".
+        endpoint (str): API path to crawl.
+        page_size (int): Fixed page size; chosen adaptively when omitted.
+
+    Returns:
+        A ``PageSpool`` reading the crawled pages in order, or None in case of an error.
+    """
+    checkpoint = CrawlCheckpoint(endpoint, params, pages_path=spool_path)
+    progress = _CrawlProgress(checkpoint)
+    if engine == "async":
+        ok = asyncio.run(_run_crawl_async_with_session(params, ASYNC_MAX_CONCURRENCY, REQUEST_TIMEOUT,
+                                                      endpoint, page_size, progress))
+    elif engine == "threads":
+        ok = _run_crawl(params, max_workers, endpoint, page_size, progress)
+    else:
+        raise ValueError(f"Unknown fetch engine: {engine}")
+    if not ok:
+        return None
+    checkpoint.clear(keep_pages=True)
+    return checkpoint.spool
+
+
+# --- Any Consulta Endpoint ---
+def query_endpoint(endpoint: str, params: Dict[str, Any], max_workers: int = MAX_WORKERS,
+                   engine: str = "threads", page_size: Optional[int] = None,
+                   resume: bool = True) -> Optional[pd.DataFrame]:
+    """Crawls any paginated endpoint described in api-docs.json into a DataFrame.
+
+    Args:
+        endpoint (str): Endpoint path (``/v1/contratos``) or name (``contratos``).
+        params (dict): Query parameters, without ``pagina``/``tamanhoPagina``;
+            checked against the document before the first request.
+        max_workers, engine, page_size, resume: As in ``query_all_contracts``.
+
+    Raises:
+        ValueError: If the endpoint is unknown or the parameters are invalid.
+    """
+    spec = get_endpoint(endpoint)
+    return query_all_contracts(spec.validate(params), max_workers=max_workers, engine=engine,
+                               endpoint=spec.path, page_size=page_size, resume=resume)
+
+
+def crawl_endpoint_to_spool(endpoint: str, params: Dict[str, Any], spool_path: Optional[str] = None,
+                            max_workers: int = MAX_WORKERS, engine: str = "threads",
+                            page_size: Optional[int] = None) -> Optional[PageSpool]:
+    """Streams any paginated endpoint described in api-docs.json into a JSONL spool.
+
+    ``spool_path`` defaults to ``<endpoint name>.jsonl``; see ``crawl_to_spool``.
+    """
+    spec = get_endpoint(endpoint)
+    return crawl_to_spool(spec.validate(params), spool_path or f"{spec.name}.jsonl", max_workers=max_workers,
+                          engine=engine, endpoint=spec.path, page_size=page_size)
+
+
+def load_dataset(endpoint: str, params: Dict[str, Any], engine: str = "threads", streaming: bool = False,
+                 windowed: bool = False) -> bool:
+    """Bulk-loads one endpoint into ``<name>.csv`` and ``<name>.pkl``.
+
+    With ``streaming`` the pages are spooled to ``<name>.jsonl`` and only the
+    CSV is written from it, chunk by chunk. With ``windowed``, queries with
+    dataInicial and dataFinal are crawled as bisected date windows instead
+    (in memory; ``streaming`` is ignored for them).
+
+    Returns:
+        Whether every page was fetched.
+    """
+    spec = get_endpoint(endpoint)
+    if windowed and "dataInicial" in params and "dataFinal" in params:
+        df = query_windowed_contracts(spec.validate(params), spec.path, engine=engine)
+        if df is None:
+            return False
+        save_to_csv(df, f"{spec.name}.csv")
+        save_to_pickle(df, f"{spec.name}.pkl")
+        return True
+
+    if streaming:
+        spool = crawl_endpoint_to_spool(spec.path, params, engine=engine)
+        if spool is None:
+            return False
+        spool.to_csv(f"{spec.name}.csv")
+        print(f"Data saved to: {spec.name}.csv")
+        return True
+
+    df = query_endpoint(spec.path, params, engine=engine)
+    if df is None:
+        return False
+    save_to_csv(df, f"{spec.name}.csv")
+    save_to_pickle(df, f"{spec.name}.pkl")
+    return True
+
+
+def _run_crawl(params: Dict[str, Any], max_workers: int, endpoint: str, page_size: Optional[int],
+               progress: "_CrawlProgress") -> bool:
+    """Fetches every page with the thread pool, handing each one to ``progress``."""
+    url = f"{BASE_URL}{endpoint}"
+    min_page_size, max_page_size = page_size_limits(endpoint)
+    controller = AIMDController(initial=INITIAL_CONCURRENCY, maximum=max_workers)
 
     print("Starting data fetch from API...")
-    while True:
-        query_params = params.copy()
-        query_params["pagina"] = page
-        query_params["tamanhoPagina"] = PAGE_SIZE
+    resumed_page_size = progress.resume(page_size)
+    if resumed_page_size is None:
+        first_page, page_size = _fetch_first_page(url, params, page_size or max_page_size,
+                                                  min_page_size if page_size is None else page_size, controller)
+        if first_page is None:  # Error occurred
+            return False
+        records, _, total_pages = first_page
+        progress.start(page_size, total_pages)
+        progress.add(1, records)
+    else:
+        page_size = resumed_page_size
 
-        try:
-            df, paginasRestantes, totalPaginas = _fetch_page(url, query_params)
-            if df is None:  # Error occurred
-                return None
-         
-            if total_pages is None:
-                total_pages = totalPaginas
-                pbar = tqdm(total=total_pages, desc="Fetching pages")
-            if pbar:
-                pbar.update(1)
-
-            print(f"Fetched page {page}/{totalPaginas} with {len(df)} results.")
-            all_data.append(df)
-            if paginasRestantes == 0:  # No more data
-                print("All pages fetched.")
-                break
-            page += 1
-
-        except Exception as e:
-            print(f"An unexpected error occurred during pagination: {e}")
+    pending_pages = progress.pending_pages()
+    if pending_pages:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_fetch_page_adaptive, url, params, page, page_size, min_page_size,
+                                controller): page
+                for page in pending_pages
+            }
+            for future in as_completed(futures):
+                progress.add(futures[future], future.result())
+
+    for page in progress.retry_pages():
+        progress.add(page, _fetch_page_adaptive(url, params, page, page_size, min_page_size))
+
+    return progress.finish()
+
+
+class _CrawlProgress:
+    """Pages collected by one crawl, streamed to its checkpoint spool and progress bar.
+
+    Without a checkpoint the records are kept in memory instead.
+    """
+
+    def __init__(self, checkpoint: Optional[CrawlCheckpoint]):
+        self.checkpoint = checkpoint
+        self.completed: Set[int] = set()
+        self.records: Dict[int, List[Dict[str, Any]]] = {}
+        self.failed_pages: List[int] = []
+        self.total_pages = 0
+        self.pbar: Optional[tqdm] = None
+
+    def resume(self, page_size: Optional[int]) -> Optional[int]:
+        """Restores a saved crawl and returns its page size, or None when starting fresh."""
+        if self.checkpoint is None or not self.checkpoint.exists():
+            return None
+        completed = self.checkpoint.resume()
+        if self.checkpoint.is_stale():
+            print(f"Checkpoint is older than {self.checkpoint.max_age / 3600:g} hours; starting over.")
+            return None
+        if page_size is not None and page_size != self.checkpoint.page_size:
+            print(f"Checkpoint was taken with page size {self.checkpoint.page_size}; starting over.")
             return None
 
-    if pbar:
-        pbar.close()
+        self.completed = completed
+        self._open(self.checkpoint.total_pages)
+        print(f"Resuming from checkpoint: {len(completed)}/{self.total_pages} pages already fetched.")
+        return self.checkpoint.page_size
+
+    def start(self, page_size: int, total_pages: int):
+        """Starts a fresh crawl once page 1 has revealed the page count."""
+        if self.checkpoint is not None:
+            self.checkpoint.start(page_size, total_pages)
+        self._open(total_pages)
+        print(f"Crawling {total_pages} pages of {page_size} results.")
+
+    def pending_pages(self) -> List[int]:
+        return [page for page in range(1, self.total_pages + 1) if page not in self.completed]
+
+    def retry_pages(self) -> List[int]:
+        """Hands back the failed pages for one more pass, clearing the failure list."""
+        pages, self.failed_pages = sorted(self.failed_pages), []
+        for page in pages:
+            print(f"Retrying failed page {page} on its own...")
+        return pages
+
+    def add(self, page: int, records: Optional[List[Dict[str, Any]]]):
+        """Records the outcome of a page; None marks it as failed."""
+        if records is None:
+            self.failed_pages.append(page)
+            return
+        if self.checkpoint is not None:
+            self.checkpoint.add_page(page, records)
+        else:
+            self.records[page] = list(records)  # Without the response body a RawPage carries
+        self.completed.add(page)
+        self.pbar.update(1)
+        print(f"Fetched page {page}/{self.total_pages} with {len(records)} results.")
+
+    def finish(self) -> bool:
+        """Closes the crawl and reports whether every page was fetched."""
+        if self.pbar is not None:
+            self.pbar.close()
+        print_timing_summary()
+        if self.checkpoint is not None and not self.failed_pages:
+            # The spool decides what was fetched: a page whose line did not land is missing
+            spooled = set(self.checkpoint.spool.pages())
+            self.failed_pages = [page for page in range(1, self.total_pages + 1) if page not in spooled]
+            self.completed &= spooled
+        if self.failed_pages:
+            print(f"Error: could not fetch pages {sorted(self.failed_pages)}.")
+            if self.checkpoint is not None:
+                print(f"{len(self.completed)} fetched pages were kept in the checkpoint for the next run.")
+            return False
+        print("All pages fetched.")
+        return True
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Assembles the pages, in order, into one DataFrame."""
+        if self.checkpoint is not None:
+            return self.checkpoint.spool.to_dataframe()
+        return records_to_dataframe(self.records[page] for page in sorted(self.records))
+
+    def discard(self):
+        """Drops the checkpoint once its data has been handed over."""
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+
+    def _open(self, total_pages: int):
+        self.total_pages = total_pages
+        self.pbar = tqdm(total=max(total_pages, 1), desc="Fetching pages", initial=len(self.completed))
+
+
+# --- Page Sizing ---
+def page_size_limits(endpoint: str, api_docs_path: str = API_DOCS_PATH) -> Tuple[int, int]:
+    """Returns the (minimum, maximum) page size the API accepts for an endpoint."""
+    try:
+        spec = load_endpoints(api_docs_path).get(endpoint)
+    except (OSError, ValueError) as e:
+        print(f"Could not read page size limits from {api_docs_path}: {e}")
+        spec = None
+    if spec is None:
+        return DEFAULT_PAGE_SIZE, DEFAULT_PAGE_SIZE
+    return spec.min_page_size, spec.max_page_size or DEFAULT_PAGE_SIZE
+
+
+def _smaller_page_size(page_size: int, min_page_size: int) -> Optional[int]:
+    """Returns the next page size to try after a slow or failed request, or None at the floor."""
+    if page_size <= min_page_size:
+        return None
+    return max(page_size // 2, min_page_size)
+
+
+def _split_page_size(page_size: int, min_page_size: int) -> Optional[int]:
+    """Returns the half page size that covers a page exactly with two requests, if allowed."""
+    half = page_size // 2
+    if page_size % 2 or half < min_page_size:
+        return None
+    return half
+
 
-    if not all_data:
-        return pd.DataFrame()  # Return empty DataFrame if no data found
+def _page_params(params: Dict[str, Any], page: int, page_size: int) -> Dict[str, Any]:
+    """Returns a copy of the request parameters pointing at the given page."""
+    query_params = params.copy()
+    query_params["pagina"] = page
+    query_params["tamanhoPagina"] = page_size
+    return query_params
 
-    return pd.concat(all_data, ignore_index=True)
 
+def _fetch_first_page(url: str, params: Dict[str, Any], page_size: int, min_page_size: int,
+                      controller: Optional[AIMDController] = None):
+    """Fetches page 1, halving the page size while the response is slow or fails.
 
-def _fetch_page(url: str, params: Dict[str, Any]) -> Optional[pd.DataFrame]:
-    """Fetches a single page of data from the API."""
+    Throttling and server errors are retried with the usual backoff at the
+    same size; only a timeout, a slow answer or a page that still fails once
+    retries run out makes the page size smaller.
+
+    Returns:
+        The page result (or None) and the page size the crawl must use.
+    """
+    while True:
+        smaller = _smaller_page_size(page_size, min_page_size)
+        start = time.perf_counter()
+        result = _fetch_page(url, _page_params(params, 1, page_size), controller,
+                             retry_timeouts=smaller is None)
+        elapsed = time.perf_counter() - start
+        if smaller is None or (result is not None and elapsed <= SLOW_PAGE_SECONDS):
+            return result, page_size
+        reason = "failed" if result is None else f"took {elapsed:.1f}s"
+        print(f"Page size {page_size} {reason}; backing off to {smaller}.")
+        page_size = smaller
+
+
+def _fetch_page_adaptive(url: str, params: Dict[str, Any], page: int, page_size: int,
+                         min_page_size: int, controller: Optional[AIMDController] = None) -> Optional[List[Dict[str, Any]]]:
+    """Fetches one page; if it keeps failing, fetches the same rows as two half-size pages."""
+    result = _fetch_page(url, _page_params(params, page, page_size), controller)
+    if result is not None:
+        return result[0]
+
+    half = _split_page_size(page_size, min_page_size)
+    if half is None:
+        return None
+    print(f"Page {page} failed at size {page_size}; fetching it as two pages of {half}.")
+    halves = [_fetch_page_adaptive(url, params, sub_page, half, min_page_size, controller)
+              for sub_page in (2 * page - 1, 2 * page)]
+    if any(part is None for part in halves):
+        return None
+    return halves[0] + halves[1]
+
+
+def _fetch_page(url: str, params: Dict[str, Any], controller: Optional[AIMDController] = None,
+                max_retries: int = MAX_RETRIES,
+                retry_timeouts: bool = True) -> Optional[Tuple[List[Dict[str, Any]], int, int]]:
+    """Fetches a single page of data from the API, retrying throttled or failed requests."""
 
     try:
-        response = requests.get(url, params=params)
+        response = http_get_with_retry(url, params=params, max_retries=max_retries, controller=controller,
+                                       retry_timeouts=retry_timeouts)
         response.raise_for_status()  # Raises an exception for error status (4xx or 5xx)
-        data = response.json()
+        if response.status_code == 204:  # No records match the parameters
+            return [], 0, 0
+        data = fast_json.loads(response.content)
 
         if "data" in data:
-            return pd.DataFrame(data["data"]), data["paginasRestantes"], data["totalPaginas"]
+            return RawPage(data["data"], response.content), data["paginasRestantes"], data["totalPaginas"]
         else:
             print("Error: API response does not contain valid data.")
             return None
@@ -83,6 +482,514 @@ def _fetch_page(url: str, params: Dict[str, Any]) -> Optional[pd.DataFrame]:
         return None
 
 
+# --- Async Engine ---
+async def query_all_contracts_async(params: Dict[str, Any],
+                                    max_concurrency: int = ASYNC_MAX_CONCURRENCY,
+                                    timeout: float = REQUEST_TIMEOUT,
+                                    session: Optional[aiohttp.ClientSession] = None,
+                                    semaphore: Optional[asyncio.Semaphore] = None,
+                                    endpoint: str = ENDPOINT,
+                                    page_size: Optional[int] = None,
+                                    resume: bool = True) -> Optional[pd.DataFrame]:
+    """
+    Asyncio counterpart of ``query_all_contracts``.
+
+    All pages after the first are scheduled at once on the event loop. An
+    AIMD controller decides how many requests are in flight, up to
+    ``max_concurrency``. Several crawls (other endpoints or parameter shards)
+    can be gathered on the same loop and share one ``session`` and
+    ``semaphore`` so a hard cap applies to all of them.
+
+    Args:
+        params (dict): Dictionary with the request parameters.
+        max_concurrency (int): Maximum number of requests in flight.
+        timeout (float): Seconds allowed for each page request.
+        session (aiohttp.ClientSession): Optional session to reuse, ideally
+            one from ``pncp_http.create_async_session``.
+        semaphore (asyncio.Semaphore): Optional semaphore shared between crawls.
+        endpoint (str): API path to crawl.
+        page_size (int): Fixed page size; chosen adaptively when omitted.
+        resume (bool): Whether to checkpoint the crawl and resume a previous one.
+
+    Returns:
+        A single DataFrame with all contract data, or None in case of an error.
+    """
+    progress = _CrawlProgress(CrawlCheckpoint(endpoint, params) if resume else None)
+    if session is None:
+        ok = await _run_crawl_async_with_session(params, max_concurrency, timeout, endpoint, page_size,
+                                                 progress, semaphore)
+    else:
+        ok = await _run_crawl_async(params, max_concurrency, timeout, session, semaphore, endpoint,
+                                    page_size, progress)
+    if not ok:
+        return None
+    df = progress.to_dataframe()
+    progress.discard()
+    return df
+
+
+async def _run_crawl_async_with_session(params: Dict[str, Any], max_concurrency: int, timeout: float,
+                                        endpoint: str, page_size: Optional[int], progress: _CrawlProgress,
+                                        semaphore: Optional[asyncio.Semaphore] = None) -> bool:
+    """Runs ``_run_crawl_async`` on a session of its own."""
+    async with create_async_session(max_concurrency) as session:
+        return await _run_crawl_async(params, max_concurrency, timeout, session, semaphore, endpoint,
+                                      page_size, progress)
+
+
+async def _run_crawl_async(params: Dict[str, Any], max_concurrency: int, timeout: float,
+                           session: aiohttp.ClientSession, semaphore: Optional[asyncio.Semaphore],
+                           endpoint: str, page_size: Optional[int], progress: _CrawlProgress) -> bool:
+    """Fetches every page on the event loop, handing each one to ``progress``."""
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+    url = f"{BASE_URL}{endpoint}"
+    min_page_size, max_page_size = page_size_limits(endpoint)
+    controller = AIMDController(initial=INITIAL_CONCURRENCY, maximum=max_concurrency)
+    fetcher = _AsyncPageFetcher(session, semaphore, controller, url, params, timeout, min_page_size)
+
+    print("Starting async data fetch from API...")
+    resumed_page_size = progress.resume(page_size)
+    if resumed_page_size is None:
+        first_page, page_size = await fetcher.first_page(page_size or max_page_size,
+                                                         min_page_size if page_size is None else page_size)
+        if first_page is None:  # Error occurred
+            return False
+        records, _, total_pages = first_page
+        progress.start(page_size, total_pages)
+        progress.add(1, records)
+    else:
+        page_size = resumed_page_size
+
+    async def fetch(page: int):
+        progress.add(page, await fetcher.page(page, page_size))
+
+    await asyncio.gather(*(fetch(page) for page in progress.pending_pages()))
+    for page in progress.retry_pages():
+        await fetch(page)
+
+    return progress.finish()
+
+
+class _AsyncPageFetcher:
+    """Event-loop version of the page fetching helpers for one crawl."""
+
+    def __init__(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                 controller: AIMDController, url: str, params: Dict[str, Any], timeout: float,
+                 min_page_size: int):
+        self.session = session
+        self.semaphore = semaphore
+        self.controller = controller
+        self.url = url
+        self.params = params
+        self.timeout = timeout
+        self.min_page_size = min_page_size
+
+    async def first_page(self, page_size: int, min_page_size: int):
+        """Fetches page 1, halving the page size while the response is slow or fails (see ``_fetch_first_page``)."""
+        while True:
+            smaller = _smaller_page_size(page_size, min_page_size)
+            start = time.perf_counter()
+            result = await self.fetch(_page_params(self.params, 1, page_size), retry_timeouts=smaller is None)
+            elapsed = time.perf_counter() - start
+            if smaller is None or (result is not None and elapsed <= SLOW_PAGE_SECONDS):
+                return result, page_size
+            reason = "failed" if result is None else f"took {elapsed:.1f}s"
+            print(f"Page size {page_size} {reason}; backing off to {smaller}.")
+            page_size = smaller
+
+    async def page(self, page: int, page_size: int) -> Optional[List[Dict[str, Any]]]:
+        """Fetches one page; if it keeps failing, fetches the same rows as two half-size pages."""
+        result = await self.fetch(_page_params(self.params, page, page_size))
+        if result is not None:
+            return result[0]
+
+        half = _split_page_size(page_size, self.min_page_size)
+        if half is None:
+            return None
+        print(f"Page {page} failed at size {page_size}; fetching it as two pages of {half}.")
+        halves = await asyncio.gather(*(self.page(sub_page, half) for sub_page in (2 * page - 1, 2 * page)))
+        if any(part is None for part in halves):
+            return None
+        return halves[0] + halves[1]
+
+    async def fetch(self, params: Dict[str, Any], max_retries: int = MAX_RETRIES, retry_timeouts: bool = True):
+        """Fetches a single page, retrying throttled or failed requests."""
+        return await _fetch_page_async(self.session, self.url, params, self.timeout, self.controller,
+                                       self.semaphore, max_retries, retry_timeouts)
+
+
+async def _fetch_page_async(session: aiohttp.ClientSession, url: str, params: Dict[str, Any],
+                            timeout: float, controller: Optional[AIMDController] = None,
+                            semaphore: Optional[asyncio.Semaphore] = None,
+                            max_retries: int = MAX_RETRIES,
+                            retry_timeouts: bool = True) -> Optional[Tuple[List[Dict[str, Any]], int, int]]:
+    """Fetches a single page of data from the API without blocking the event loop."""
+
+    try:
+        response = await async_http_get_with_retry(session, url, params=params, timeout=timeout,
+                                                   max_retries=max_retries, controller=controller,
+                                                   semaphore=semaphore, retry_timeouts=retry_timeouts)
+        response.raise_for_status()  # Raises an exception for error status (4xx or 5xx)
+        if response.status == 204:  # No records match the parameters
+            return [], 0, 0
+        data = fast_json.loads(response.body)
+
+        if "data" in data:
+            return RawPage(data["data"], response.body), data["paginasRestantes"], data["totalPaginas"]
+        else:
+            print("Error: API response does not contain valid data.")
+            return None
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error during request: {e!r}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return None
+
+
+# --- Sharded Crawl ---
+def build_shards(params: Dict[str, Any], ufs: Optional[List[str]] = None,
+                 modalidades: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Splits one query into per-UF (and optionally per-modalidade) parameter dicts.
+
+    Filters already present in ``params`` are kept and not split further.
+    """
+    ufs = [params["uf"]] if "uf" in params else (ufs or UFS)
+    if "codigoModalidadeContratacao" in params:
+        modalidades = [params["codigoModalidadeContratacao"]]
+
+    shards = []
+    for uf in ufs:
+        for codigo in (modalidades or [None]):
+            shard = dict(params, uf=uf)
+            if codigo is not None:
+                shard["codigoModalidadeContratacao"] = codigo
+            shards.append(shard)
+    return shards
+
+
+def _probe_total_pages(endpoint: str, params: Dict[str, Any]) -> Optional[int]:
+    """Returns the totalPaginas the endpoint reports for a query at its maximum page size."""
+    _, max_page_size = page_size_limits(endpoint)
+    result = _fetch_page(f"{BASE_URL}{endpoint}", _page_params(params, 1, max_page_size))
+    return None if result is None else result[2]
+
+
+def query_sharded_contracts(params: Dict[str, Any], ufs: Optional[List[str]] = None,
+                            modalidades: Optional[List[int]] = None, shard_workers: int = SHARD_WORKERS,
+                            max_workers: int = MAX_WORKERS // SHARD_WORKERS, engine: str = "threads",
+                            endpoint: str = ENDPOINT) -> Optional[pd.DataFrame]:
+    """Crawls one logical query as independent per-UF (and per-modalidade) shards.
+
+    Page 1 of every shard is probed first; empty shards are skipped and the
+    rest are crawled in parallel, biggest first, so the longest page
+    sequences do not end up running alone at the end. Each shard is a short
+    page sequence of its own, which limits pagination drift and keeps
+    retries and checkpoints small. Results are merged and deduplicated on
+    ``numeroControlePNCP``.
+
+    Args:
+        params (dict): Dictionary with the request parameters.
+        ufs (list): UFs to split by; defaults to every UF.
+        modalidades (list): Optional modalidade codes to split each UF by.
+        shard_workers (int): Number of shards crawled at the same time.
+        max_workers (int): Pages fetched concurrently within each shard.
+        engine (str): "threads" or "async".
+        endpoint (str): API path to crawl.
+
+    Returns:
+        A single DataFrame with all contract data, or None in case of an error.
+    """
+    shards = build_shards(params, ufs, modalidades)
+    print(f"Probing {len(shards)} shards...")
+    with ThreadPoolExecutor(max_workers=max(shard_workers, max_workers)) as executor:
+        totals = list(executor.map(lambda shard: _probe_total_pages(endpoint, shard), shards))
+    if any(total is None for total in totals):
+        print("Error: could not probe every shard.")
+        return None
+
+    return _crawl_shards(list(zip(totals, shards)), shard_workers, max_workers, engine, endpoint)
+
+
+def _crawl_shards(probed: List[Tuple[int, Dict[str, Any]]], shard_workers: int, max_workers: int,
+                  engine: str, endpoint: str) -> Optional[pd.DataFrame]:
+    """Crawls probed ``(totalPaginas, params)`` shards, biggest first, and merges them."""
+    ranked = sorted(((total, shard) for total, shard in probed if total), key=lambda item: -item[0])
+    print(f"Crawling {len(ranked)} non-empty shards with {sum(total for total, _ in ranked)} pages in total.")
+    ordered = [shard for _, shard in ranked]
+    if engine == "async":
+        results = asyncio.run(_query_shards_async(ordered, endpoint, shard_workers * max_workers))
+    else:
+        with ThreadPoolExecutor(max_workers=shard_workers) as executor:
+            results = list(executor.map(
+                lambda shard: query_all_contracts(shard, max_workers=max_workers, endpoint=endpoint), ordered))
+
+    failed = [shard for shard, df in zip(ordered, results) if df is None]
+    if failed:
+        print(f"Error: {len(failed)} shards failed: {failed}")
+        return None
+    frames = [df for df in results if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    merged = pd.concat(frames, ignore_index=True)
+    spec = load_endpoints().get(endpoint)
+    key = spec.record_key if spec is not None else RECORD_KEY
+    if key is None or key not in merged.columns:  # Records without an identifier are kept as fetched
+        return merged
+    return merged.drop_duplicates(subset=[key], keep="last", ignore_index=True)
+
+
+async def _query_shards_async(shards: List[Dict[str, Any]], endpoint: str,
+                              max_concurrency: int) -> List[Optional[pd.DataFrame]]:
+    """Runs every shard crawl on one event loop with a shared session and in-flight cap."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with create_async_session(max_concurrency) as session:
+        return await asyncio.gather(*(
+            query_all_contracts_async(shard, max_concurrency=max_concurrency, session=session,
+                                      semaphore=semaphore, endpoint=endpoint)
+            for shard in shards
+        ))
+
+
+# --- Date-Window Bisection ---
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(str(value), "%Y%m%d")
+
+
+def _format_date(value: datetime) -> str:
+    return value.strftime("%Y%m%d")
+
+
+def plan_date_windows(params: Dict[str, Any], endpoint: str, max_pages: int = MAX_WINDOW_PAGES,
+                      probe_workers: int = MAX_WORKERS) -> Optional[List[Tuple[int, Dict[str, Any]]]]:
+    """Splits the dataInicial..dataFinal range of a query into windows of at most ``max_pages`` pages.
+
+    Page 1 of the whole range is probed; any window reporting more than
+    ``max_pages`` pages (at the endpoint's maximum page size) is cut in two
+    halves and each half is probed again, one level at a time with all
+    probes of a level in parallel. A single day cannot be cut further and
+    is kept whatever its size. Empty windows are dropped.
+
+    Returns:
+        ``(totalPaginas, params)`` of every window in date order, or None if a probe failed.
+    """
+    frontier = [(_parse_date(params["dataInicial"]), _parse_date(params["dataFinal"]))]
+    windows: List[Tuple[int, Dict[str, Any]]] = []
+    probes = 0
+    with ThreadPoolExecutor(max_workers=probe_workers) as executor:
+        while frontier:
+            window_params = [dict(params, dataInicial=_format_date(start), dataFinal=_format_date(end))
+                             for start, end in frontier]
+            totals = list(executor.map(lambda window: _probe_total_pages(endpoint, window), window_params))
+            probes += len(frontier)
+            if any(total is None for total in totals):
+                print("Error: could not probe every date window.")
+                return None
+
+            next_frontier = []
+            for (start, end), window, total in zip(frontier, window_params, totals):
+                if total > max_pages and start < end:
+                    middle = start + timedelta(days=(end - start).days // 2)
+                    next_frontier += [(start, middle), (middle + timedelta(days=1), end)]
+                elif total:
+                    if total > max_pages:
+                        print(f"Window {window['dataInicial']} has {total} pages and cannot be split further.")
+                    windows.append((total, window))
+            frontier = next_frontier
+
+    windows.sort(key=lambda item: item[1]["dataInicial"])
+    print(f"Planned {len(windows)} date windows with {probes} probes.")
+    return windows
+
+
+def query_windowed_contracts(params: Dict[str, Any], endpoint: str, max_pages: int = MAX_WINDOW_PAGES,
+                             window_workers: int = SHARD_WORKERS, max_workers: int = MAX_WORKERS // SHARD_WORKERS,
+                             engine: str = "threads") -> Optional[pd.DataFrame]:
+    """Crawls a date-ranged query as balanced date windows in parallel.
+
+    Windows come from ``plan_date_windows``, so none is deeper than
+    ``max_pages`` pages (save single days); shallow windows are quicker to
+    page through and far less exposed to records published mid-crawl. The
+    windows are then crawled like shards: biggest first, merged and
+    deduplicated on the endpoint's record key (``numeroControlePNCP``,
+    ``numeroControlePNCPAta`` for atas; none for instrumentos de cobrança).
+
+    Args:
+        params (dict): Request parameters, including dataInicial and dataFinal (yyyyMMdd).
+        endpoint (str): A date-ranged API path such as /v1/contratacoes/publicacao,
+            /v1/contratos or /v1/atas.
+        max_pages (int): Deepest window, in pages at the endpoint's maximum page size.
+        window_workers (int): Number of windows crawled at the same time.
+        max_workers (int): Pages fetched concurrently within each window.
+        engine (str): "threads" or "async".
+
+    Returns:
+        A single DataFrame with all the data, or None in case of an error.
+    """
+    if "dataInicial" not in params or "dataFinal" not in params:
+        raise ValueError("A windowed crawl needs dataInicial and dataFinal")
+    windows = plan_date_windows(params, endpoint, max_pages, max(window_workers, max_workers))
+    if windows is None:
+        return None
+    return _crawl_shards(windows, window_workers, max_workers, engine, endpoint)
+
+
+# --- Incremental Sync ---
+def load_watermark(path: str = SYNC_STATE_PATH) -> Optional[pd.Timestamp]:
+    """Returns the highest dataAtualizacaoGlobal seen by the last sync, if any."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    watermark = state.get("dataAtualizacaoGlobal")
+    return pd.Timestamp(watermark) if watermark else None
+
+
+def save_watermark(df: pd.DataFrame, path: str = SYNC_STATE_PATH):
+    """Stores the highest dataAtualizacaoGlobal present in the raw dataset."""
+    if df is None or df.empty or "dataAtualizacaoGlobal" not in df:
+        return
+    watermark = pd.to_datetime(df["dataAtualizacaoGlobal"], errors="coerce").max()
+    if pd.isna(watermark):
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"dataAtualizacaoGlobal": watermark.isoformat()}, f)
+    print(f"Sync watermark set to {watermark.isoformat()}.")
+
+
+def query_updated_contracts(since: pd.Timestamp, until: Optional[pd.Timestamp] = None,
+                            engine: str = "threads") -> Optional[pd.DataFrame]:
+    """Fetches the contratações updated since ``since`` from the atualizacao endpoint.
+
+    The endpoint requires a modalidade, so every code in ``MODALIDADES`` is
+    queried. Its date filter has day granularity; records updated on the
+    watermark day but before the watermark itself are dropped here.
+
+    Returns:
+        The changed records, or None if any modalidade could not be fetched.
+    """
+    until = until or pd.Timestamp.now()
+    changes: List[pd.DataFrame] = []
+    for codigo, nome in MODALIDADES.items():
+        params = {
+            "dataInicial": since.strftime("%Y%m%d"),
+            "dataFinal": until.strftime("%Y%m%d"),
+            "codigoModalidadeContratacao": codigo,
+        }
+        print(f"Fetching updates for modalidade {codigo} ({nome})...")
+        df = query_all_contracts(params, engine=engine, endpoint=UPDATES_ENDPOINT)
+        if df is None:
+            return None
+        changes.append(df)
+
+    changes = [df for df in changes if not df.empty]
+    if not changes:
+        return pd.DataFrame()
+    updated = pd.concat(changes, ignore_index=True)
+    updated_at = pd.to_datetime(updated["dataAtualizacaoGlobal"], errors="coerce")
+    return updated[updated_at > since].reset_index(drop=True)
+
+
+def upsert_contracts(existing: pd.DataFrame, changes: pd.DataFrame,
+                     open_only: bool = True) -> pd.DataFrame:
+    """Merges changed records into the raw dataset by ``numeroControlePNCP``.
+
+    Records already in the dataset are replaced by their newest version.
+    With ``open_only``, the result only keeps records whose proposal period
+    is still open, matching what the proposta endpoint returns on a full
+    load: closed records are neither added nor kept. Without it the dataset
+    accumulates history.
+    """
+    if changes is None or changes.empty:
+        return existing
+    changes = (changes.sort_values("dataAtualizacaoGlobal")
+                      .drop_duplicates(subset=[RECORD_KEY], keep="last"))
+    known = changes[RECORD_KEY].isin(existing[RECORD_KEY])
+    if open_only:
+        closes_at = pd.to_datetime(changes["dataEncerramentoProposta"], errors="coerce")
+        changes = changes[known | (closes_at >= pd.Timestamp.now())]
+        known = changes[RECORD_KEY].isin(existing[RECORD_KEY])
+
+    print(f"Upserting {int(known.sum())} updated and {int((~known).sum())} new records.")
+    kept = existing[~existing[RECORD_KEY].isin(changes[RECORD_KEY])]
+    merged = pd.concat([kept, changes], ignore_index=True)
+    if open_only:
+        closed = pd.to_datetime(merged["dataEncerramentoProposta"], errors="coerce") < pd.Timestamp.now()
+        if closed.any():
+            print(f"Dropping {int(closed.sum())} records whose proposal period has closed.")
+            merged = merged[~closed].reset_index(drop=True)
+    return merged
+
+
+def sync_contracts(existing: pd.DataFrame, engine: str = "threads") -> Optional[pd.DataFrame]:
+    """Brings the raw dataset up to date with the records changed since the stored watermark.
+
+    Returns:
+        The updated dataset, or None if there is no watermark or the fetch failed.
+    """
+    watermark = load_watermark()
+    if watermark is None:
+        print("No sync watermark found; a full load is required.")
+        return None
+    print(f"Fetching records updated since {watermark.isoformat()}...")
+    changes = query_updated_contracts(watermark, engine=engine)
+    if changes is None:
+        return None
+    return upsert_contracts(existing, changes)
+
+
+# --- Incremental Processing ---
+def process_changes(raw: pd.DataFrame, clean: pd.DataFrame, index: DedupIndex) -> pd.DataFrame:
+    """Updates a clean dataset by running ``process_data`` only on records that changed.
+
+    A record's version is its ``dataAtualizacaoGlobal``, which PNCP bumps on
+    every change (as in ``enrichment``); the previous version is read from
+    ``clean`` itself, so no other state has to match it. Records that are
+    new or whose version differs are transformed, clean rows of changed or
+    vanished records are dropped and their fingerprints leave ``index``,
+    and the transformed rows are deduplicated against ``index``, so the rows
+    already in ``clean`` win and the rest of the table is never compared.
+
+    Records missing from ``clean`` because they were dropped as duplicates
+    are transformed again on every run, so one whose duplicate went away is
+    picked up; with the default key there are none.
+
+    Args:
+        raw (pandas.DataFrame): Current raw records.
+        clean (pandas.DataFrame): Clean dataset built from earlier raw records.
+        index (DedupIndex): Fingerprints of the rows of ``clean``; rebuilt if it
+            does not match them, and updated in place.
+
+    Returns:
+        The updated clean dataset.
+    """
+    if len(index) != len(clean):
+        print(f"Dedup index has {len(index)} records for {len(clean)} clean rows; rebuilding it.")
+        index.rebuild(fingerprints(clean, index.key))
+    raw = raw.drop_duplicates(subset=[RECORD_KEY], keep="last", ignore_index=True)
+    versions = raw[[VERSION_COLUMN]].copy()
+    parse_dates(versions, [VERSION_COLUMN])
+    previous = pd.Series(clean[VERSION_COLUMN].to_numpy(), index=clean[RECORD_KEY].to_numpy())
+    previous = previous[~previous.index.duplicated(keep="last")].reindex(raw[RECORD_KEY].to_numpy())
+    current = versions[VERSION_COLUMN].to_numpy()
+    unchanged = (previous.to_numpy() == current) | (previous.isna().to_numpy() & pd.isna(current))
+    changed = ~(unchanged & raw[RECORD_KEY].isin(clean[RECORD_KEY]).to_numpy())
+    print(f"Processing {int(changed.sum())} of {len(raw)} records (new, changed or not in the clean table).")
+
+    stale = (clean[RECORD_KEY].isin(raw[RECORD_KEY][changed]) | ~clean[RECORD_KEY].isin(raw[RECORD_KEY])).to_numpy()
+    if not changed.any() and not stale.any():
+        return clean
+    index.discard(fingerprints(clean[stale], index.key))
+    merged = clean[~stale]
+    if changed.any():
+        fresh = process_data(raw[changed].reset_index(drop=True), report=False, index=index)
+        merged = pd.concat([merged, fresh], ignore_index=True)
+    return compact_dtypes(merged)
+
+
 def save_to_csv(df: pd.DataFrame, filename: str = "contracts.csv"):
     """Saves the data from a DataFrame to a CSV file.
 
@@ -111,29 +1018,47 @@ def save_to_pickle(df: pd.DataFrame, filename: str = "contracts.pkl"):
         print("No data to save.")
 
 
-def process_data(df: pd.DataFrame) -> pd.DataFrame:
+def save_clean(df: pd.DataFrame, filename: str = "contracts_clean.pkl"):
+    """Saves the clean dataset as a fact table and its dimension tables, each as pickle and CSV.
+
+    ``contracts_clean.pkl`` holds the facts with integer keys into
+    ``contracts_clean_orgaos.pkl``, ``contracts_clean_unidades.pkl`` and
+    ``contracts_clean_amparos.pkl``; ``dimensions.load_clean`` joins them back.
+
+    Args:
+        df (pandas.DataFrame): Output of ``process_data``.
+        filename (str): Name of the fact table pickle.
+    """
+    fact, tables = split_dimensions(df)
+    save_to_csv(fact, os.path.splitext(filename)[0] + ".csv")
+    save_to_pickle(fact, filename)
+    for name, table in tables.items():
+        path = dimension_path(filename, name)
+        save_to_csv(table, os.path.splitext(path)[0] + ".csv")
+        save_to_pickle(table, path)
+
+
+def process_data(df: pd.DataFrame, report: bool = True, index: Optional[DedupIndex] = None) -> pd.DataFrame:
     """Process the dataframe to a cleaner version
     Args:
         df (pandas.DataFrame): DataFrame with the data.
+        report (bool): Print the per-column memory saved by ``compact_dtypes``.
+        index (DedupIndex): Records already kept by earlier batches; only duplicates within ``df`` are removed when omitted.
 
     """
-    #remove duplicates keeping unique using as key the columns valorTotalHomologado and objetoCompra
-    df.drop_duplicates(subset=['valorTotalHomologado', 'objetoCompra'], inplace=True)
+    #remove duplicates by the fingerprint of DEDUP_KEY (numeroControlePNCP), keeping the first
+    df = (index if index is not None else DedupIndex()).drop_seen(df)
 
     #ensure that datetime on the date using format as 2027-06-18T17:30:00
-    df['dataAberturaProposta'] = pd.to_datetime(df['dataAberturaProposta'], errors='coerce')
-    df['dataEncerramentoProposta'] = pd.to_datetime(df['dataEncerramentoProposta'], errors='coerce')
-    df['dataInclusao'] = pd.to_datetime(df['dataInclusao'], errors='coerce')
-    df['dataPublicacaoPncp'] = pd.to_datetime(df['dataPublicacaoPncp'], errors='coerce')
-    df['dataAtualizacao'] = pd.to_datetime(df['dataAtualizacao'], errors='coerce')
-    df['dataAtualizacaoGlobal'] = pd.to_datetime(df['dataAtualizacaoGlobal'], errors='coerce')
+    unparseable = parse_dates(df)
+    if any(unparseable.values()):
+        print(f"Unparseable dates: {unparseable}")
 
     #copy the column valorTotalHomologado to field named valor
     df['valor'] = df['valorTotalEstimado']
 
     #unparse the json column orgaoEntidade into new columns
-    orgao_entidade_df = pd.json_normalize(df['orgaoEntidade'])
-    df = pd.concat([df.drop('orgaoEntidade', axis=1), orgao_entidade_df], axis=1)
+    flatten_nested(df, 'orgaoEntidade')
 
     #inside the json file, process the poderId to with a enum conversation E:Estadual, M:Municipal,N:Nacional
     poder_map = {
@@ -144,18 +1069,221 @@ def process_data(df: pd.DataFrame) -> pd.DataFrame:
     df['poder'] = df['poderId'].map(poder_map)
 
     # Unparse 'unidadeOrgao' JSON column
-    unidade_orgao_df = pd.json_normalize(df['unidadeOrgao'])
-    df = pd.concat([df.drop('unidadeOrgao', axis=1), unidade_orgao_df], axis=1)
+    flatten_nested(df, 'unidadeOrgao')
+
+    # Unparse 'amparoLegal' into amparoLegalCodigo, amparoLegalNome and amparoLegalDescricao
+    flatten_nested(df, 'amparoLegal', prefix='amparoLegal')
+
+    # Store enums as categoricals and narrow the numeric columns
+    before = df.memory_usage(deep=True)
+    compact_dtypes(df)
+    if report:
+        print_memory_report(before, df.memory_usage(deep=True))
 
     return df
 
 
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts the clean dataset to its compact schema, in place.
+
+    ``CATEGORY_COLUMNS`` become categoricals, ``BOOLEAN_COLUMNS`` nullable
+    booleans and integer columns the smallest integer type that holds their
+    values. Floats are left alone: the valor columns are money.
+    """
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    for column in BOOLEAN_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("boolean")
+    for column in df.select_dtypes(include="integer").columns:
+        df[column] = pd.to_numeric(df[column], downcast="integer")
+    return df
+
+
+def print_memory_report(before: pd.Series, after: pd.Series):
+    """Prints the memory of every column whose size changed, and the totals, in MB."""
+    report = pd.DataFrame({"before": before, "after": after}).fillna(0) / 1e6
+    changed = report[report["before"] != report["after"]].drop(index="Index", errors="ignore")
+    changed = changed.sort_values("before", ascending=False)
+    changed.loc["total"] = report.sum()
+    print("Memory usage (MB):")
+    print(changed.round(2).to_string())
+
+
+def parse_dates(df: pd.DataFrame, columns: Optional[List[str]] = None) -> Dict[str, int]:
+    """Converts the ISO date columns to datetime64 in place and counts the values that failed.
+
+    All columns are stacked into one array and cast by NumPy's C ISO 8601
+    parser in a single call, with no per-value format inference. Only if
+    that cast rejects something (a malformed value or a UTC offset) are the
+    values parsed with the exact ``DATE_FORMAT`` in pandas, and the few
+    that still do not match go through the general parser one by one; what
+    fails there becomes NaT.
+
+    Args:
+        df (pandas.DataFrame): Frame to modify.
+        columns (list): Date columns; defaults to ``DATE_COLUMNS``.
+
+    Returns:
+        For each column, how many non-empty values could not be parsed.
+    """
+    columns = [column for column in (columns or DATE_COLUMNS) if column in df.columns]
+    if not columns:
+        return {}
+    rows = len(df)
+    values = np.concatenate([df[column].to_numpy(dtype=object) for column in columns])
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # NumPy only warns about offsets it would drop
+            parsed = values.astype("datetime64[ns]")
+        failed = np.zeros(len(values), dtype=bool)
+    except (ValueError, UserWarning, DeprecationWarning):
+        parsed, failed = _parse_dates_slow(values)
+
+    unparseable = {}
+    for i, column in enumerate(columns):
+        df[column] = parsed[i * rows:(i + 1) * rows]
+        unparseable[column] = int(failed[i * rows:(i + 1) * rows].sum())
+    return unparseable
+
+
+def _parse_dates_slow(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Parses dates when some are off-format; returns the datetimes and a mask of failures."""
+    series = pd.Series(values, dtype=object)
+    series = series.where(series != "")
+    parsed = pd.to_datetime(series, format=DATE_FORMAT, errors="coerce").astype("datetime64[ns]")
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = pd.Series([_parse_date_value(value) for value in series[retry]],
+                                  index=series.index[retry], dtype="datetime64[ns]")
+    return parsed.to_numpy(), (parsed.isna() & series.notna()).to_numpy()
+
+
+def _parse_date_value(value: Any) -> pd.Timestamp:
+    """Parses one off-format date; offsets are converted to naive local (Brasília) time."""
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return pd.NaT
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(LOCAL_TIMEZONE).tz_localize(None)
+    return timestamp
+
+
+def flatten_nested(df: pd.DataFrame, column: str, fields: Optional[List[str]] = None, prefix: str = ""):
+    """Replaces a column of dicts with one column per key, in place.
+
+    The keys are read in a single pass into preallocated lists and assigned
+    by position, so no intermediate frame is built and the new columns stay
+    aligned with their rows whatever the index looks like (``json_normalize``
+    + ``concat`` aligns on the index, which breaks after ``drop_duplicates``).
+
+    Args:
+        df (pandas.DataFrame): Frame to modify.
+        column (str): Column holding the dicts (e.g. orgaoEntidade).
+        fields (list): Keys to extract; every key found when omitted.
+        prefix (str): Prepended to the keys, camel-cased (``codigo`` -> ``amparoLegalCodigo``).
+    """
+    columns = dicts_to_columns(df[column].tolist(), fields)
+    del df[column]
+    for key, values in columns.items():
+        df[prefix + key[:1].upper() + key[1:] if prefix else key] = values
+
+
+def process_spool(spool: PageSpool, chunk_rows: int = 10_000, workers: int = 1,
+                  index: Optional[DedupIndex] = None) -> pd.DataFrame:
+    """Runs ``process_data`` over a page spool one chunk at a time.
+
+    Only a few raw chunks are in memory at a time (one per worker, plus the
+    ones queued). Each chunk is deduplicated against the records of the
+    chunks before it as it is read, and the dtypes are compacted again on
+    the combined result since chunks rarely share the same categories.
+
+    Args:
+        spool (PageSpool): Raw pages to process.
+        chunk_rows (int): Rows per chunk.
+        workers (int): Processes running ``process_data``; 1 processes in this one.
+        index (DedupIndex): Records to leave out; filled with the ones kept.
+    """
+    index = index if index is not None else DedupIndex()
+    frames = (index.drop_seen(frame) for frame in spool.iter_frames(chunk_rows))
+    chunks = list(process_chunks(frames, workers))
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)  # Categoricals with different categories come back as object
+    return compact_dtypes(df)
+
+
+def process_data_parallel(df: pd.DataFrame, workers: Optional[int] = None,
+                          chunk_rows: int = PROCESS_CHUNK_ROWS, index: Optional[DedupIndex] = None) -> pd.DataFrame:
+    """Same result as ``process_data``, with the row batches processed in a process pool.
+
+    The duplicate removal spans the whole table, so it runs here first; each
+    batch is then transformed on its own and the results are concatenated
+    in their original order, with the dtypes compacted over the whole table.
+
+    Args:
+        df (pandas.DataFrame): Raw records.
+        workers (int): Worker processes; every core when omitted.
+        chunk_rows (int): Rows per batch.
+        index (DedupIndex): Records to leave out; filled with the ones kept.
+    """
+    df = (index if index is not None else DedupIndex()).drop_seen(df)
+    batches = (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+    chunks = list(process_chunks(batches, workers or os.cpu_count() or 1))
+    if not chunks:
+        return process_data(df, report=False)
+    return compact_dtypes(pd.concat(chunks, ignore_index=True))
+
+
+def process_chunks(frames: Iterable[pd.DataFrame], workers: int = 1) -> Iterator[pd.DataFrame]:
+    """Yields ``process_data`` of every frame, in order.
+
+    With more than one worker the frames are processed in a process pool;
+    at most two per worker are submitted ahead, so a lazy iterable (a spool)
+    is not read into memory all at once.
+    """
+    if workers <= 1:
+        for frame in frames:
+            yield process_data(frame, report=False)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: List[Future] = []
+        for frame in frames:
+            pending.append(pool.submit(_process_chunk, frame))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def _process_chunk(frame: pd.DataFrame) -> pd.DataFrame:
+    return process_data(frame, report=False)
 
 
 def main():
     """Main function to execute the script."""
 
     full_load = True
+    incremental = False  # Only fetch records updated since the last sync (needs contracts.pkl)
+    sharded = False  # Split the full load into per-UF shards crawled in parallel
+    streaming = False  # Spool raw pages to disk and process them in chunks instead of in memory
+    engine = "threads"  # "threads" or "async"
+    process_workers = 1  # Processes running process_data on row batches (0 = one per core)
+    use_cache = True  # Serve repeated requests from the on-disk response cache (.cache/http)
+    enrich = False  # Add the detail-only fields of new or changed records (cached in details.jsonl)
+    record = False  # Append every fetched page to the raw page archive (pages.jsonl.gz)
+    replay = False  # Answer every request from the raw page archive, with no network access
+    configure_session(pool_maxsize=MAX_WORKERS)
+    if use_cache:
+        pruned = configure_cache().prune()
+        if any(pruned.values()):
+            print(f"Cache: pruned {pruned['entries']} old entries and {pruned['bodies']} unused bodies.")
+    if replay:
+        replay_pages()
+    elif record:
+        record_pages()
 
     parameters = {
         # "dataInicial": "20250618",  # Replace with the desired start date
@@ -164,20 +1292,64 @@ def main():
         # "uf": "SC",  # Replace with the desired state code
     }
 
+    # Other consulta datasets to bulk-load into <name>.csv / <name>.pkl, keyed by endpoint name
+    datasets: Dict[str, Dict[str, Any]] = {
+        # "contratos": {"dataInicial": "20250601", "dataFinal": "20250618"},
+        # "atas": {"dataInicial": "20250601", "dataFinal": "20250618"},
+        # "pca": {"anoPca": 2025, "codigoClassificacaoSuperior": "979"},
+    }
+    windowed = True  # Bisect dataInicial..dataFinal ranges into windows of at most MAX_WINDOW_PAGES pages
+    for name, dataset_params in datasets.items():
+        load_dataset(name, dataset_params, engine=engine, streaming=streaming, windowed=windowed)
+
+    if full_load and streaming:
+        spool = crawl_to_spool(parameters, RAW_SPOOL_PATH, engine=engine)
+        if spool is not None:
+            print(f"Raw pages spooled to: {spool.path}")
+            spool.to_csv("contracts.csv")
+            print("Data saved to: contracts.csv")
+            index = DedupIndex()
+            contracts_data = process_spool(spool, workers=process_workers or os.cpu_count() or 1, index=index)
+            if enrich:
+                contracts_data = enrich_details(contracts_data, BASE_URL)
+            save_clean(contracts_data, 'contracts_clean.pkl')
+            index.save(DEDUP_INDEX_PATH)
+        return
+
+    contracts_data = None
+    if full_load and incremental and os.path.exists("contracts.pkl"):
+        contracts_data = sync_contracts(pd.read_pickle("contracts.pkl"), engine=engine)
+
     if full_load:
-        # Calls the function to query and get the data
-        contracts_data = query_all_contracts(parameters)
+        if contracts_data is None:
+            # Calls the function to query and get the data
+            if sharded:
+                contracts_data = query_sharded_contracts(parameters, engine=engine)
+            else:
+                contracts_data = query_all_contracts(parameters, engine=engine)
         save_to_csv(contracts_data, "contracts.csv")
         save_to_pickle(contracts_data, 'contracts.pkl')
+        save_watermark(contracts_data)
     else:
         #load from the pickle file
         contracts_data = pd.read_pickle("contracts.pkl")
 
     # Save the data to a CSV file
     if contracts_data is not None:
-        contracts_data = process_data(contracts_data)
-        save_to_csv(contracts_data, "contracts_clean.csv")
-        save_to_pickle(contracts_data, 'contracts_clean.pkl')
+        if os.path.exists("contracts_clean.pkl") and os.path.exists(DEDUP_INDEX_PATH):
+            # Only transform the records that changed since contracts_clean.pkl was built
+            index = DedupIndex(DEDUP_INDEX_PATH)
+            contracts_data = process_changes(contracts_data, load_clean("contracts_clean.pkl"), index)
+        else:
+            index = DedupIndex()
+            if process_workers == 1:
+                contracts_data = process_data(contracts_data, index=index)
+            else:
+                contracts_data = process_data_parallel(contracts_data, workers=process_workers or None, index=index)
+        if enrich:
+            contracts_data = enrich_details(contracts_data, BASE_URL)
+        save_clean(contracts_data, 'contracts_clean.pkl')
+        index.save(DEDUP_INDEX_PATH)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Iterator, Optional, Mapping
+from urllib.parse import urlencode
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "http")
+CACHE_TTL = 3600  # Seconds a cached response is served without asking the server again
+CACHE_MAX_AGE = 7 * 24 * 3600  # Seconds since an entry was stored or revalidated before ``prune`` drops it
+VALIDATOR_HEADERS = ("ETag", "Last-Modified")
+STORED_HEADERS = ("Content-Type",) + VALIDATOR_HEADERS
+
+
+def cache_key(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """Identifies a request by its URL and its query parameters in sorted order."""
+    query = urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk cache of raw API responses.
+
+    Bodies are gzip-compressed and stored by the SHA-256 of their content,
+    so identical pages returned for different requests are kept once. Each
+    request key points at its body through a small JSON entry holding the
+    status, the validators (ETag / Last-Modified) and when it was stored.
+
+    An entry younger than ``ttl`` is served directly. An older one is
+    revalidated with If-None-Match / If-Modified-Since when the server sent
+    validators, and refetched otherwise. Nothing is ever removed on the way;
+    ``prune`` drops old entries and the bodies no entry points at any more.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "entries"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+
+    def lookup(self, url: str, params: Optional[Mapping[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Returns the stored entry for a request, or None."""
+        try:
+            with open(self._entry_path(cache_key(url, params)), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if os.path.exists(self._body_path(entry["body"])) else None
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """Headers that let the server answer 304 if the stored body is still current."""
+        headers = {}
+        if entry["headers"].get("ETag"):
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def body(self, entry: Dict[str, Any]) -> bytes:
+        with gzip.open(self._body_path(entry["body"]), "rb") as f:
+            return f.read()
+
+    def store(self, url: str, params: Optional[Mapping[str, Any]], status: int,
+              headers: Mapping[str, str], body: bytes) -> Dict[str, Any]:
+        """Saves a response and returns its entry."""
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not os.path.exists(body_path):
+            self._write_atomic(body_path, gzip.compress(body))
+        entry = {
+            "url": url,
+            "params": {str(k): str(v) for k, v in (params or {}).items()},
+            "status": status,
+            "headers": {name: headers[name] for name in STORED_HEADERS if headers.get(name)},
+            "body": digest,
+            "stored_at": time.time(),
+        }
+        self._write_entry(cache_key(url, params), entry)
+        return entry
+
+    def prune(self, max_age: float = CACHE_MAX_AGE) -> Dict[str, int]:
+        """Deletes entries older than ``max_age`` seconds and every body no remaining entry references.
+
+        Bodies written after the pruning started are kept, since their entry
+        may not have been written yet.
+
+        Returns:
+            The number of ``entries`` and ``bodies`` removed.
+        """
+        started = time.time()
+        removed = {"entries": 0, "bodies": 0}
+        referenced = set()
+        for path in self._files("entries", ".json"):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None and started - entry["stored_at"] <= max_age:
+                referenced.add(entry["body"])
+                continue
+            if self._remove(path):
+                removed["entries"] += 1
+        for path in self._files("bodies", ".gz"):
+            digest = os.path.basename(path)[:-len(".gz")]
+            if digest in referenced:
+                continue
+            try:
+                if os.path.getmtime(path) >= started:
+                    continue
+            except OSError:
+                continue
+            if self._remove(path):
+                removed["bodies"] += 1
+        return removed
+
+    def refresh(self, url: str, params: Optional[Mapping[str, Any]], entry: Dict[str, Any]):
+        """Marks an entry as current again after the server answered 304."""
+        entry["stored_at"] = time.time()
+        self._write_entry(cache_key(url, params), entry)
+
+    def count(self, outcome: str):
+        """Adds one to the ``hits``, ``revalidated`` or ``misses`` counter."""
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def summary(self) -> str:
+        return (f"Cache: {self.stats['hits']} hits, {self.stats['revalidated']} revalidated, "
+                f"{self.stats['misses']} misses.")
+
+    def _files(self, kind: str, extension: str) -> Iterator[str]:
+        for root, _, names in os.walk(os.path.join(self.directory, kind)):
+            for name in names:
+                if name.endswith(extension):
+                    yield os.path.join(root, name)
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:  # Already removed by another process
+            return False
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, "entries", key[:2], f"{key}.json")
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "bodies", digest[:2], f"{digest}.gz")
+
+    def _write_entry(self, key: str, entry: Dict[str, Any]):
+        self._write_atomic(self._entry_path(key), json.dumps(entry).encode("utf-8"))
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
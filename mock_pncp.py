@@ -0,0 +1,369 @@
+import argparse
+import ast
+import gzip
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from pncp_endpoints import API_DOCS_PATH, PAGING_PARAMS, Endpoint, load_endpoints
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_PATH = "/api/consulta"  # Same prefix as the production BASE_URL
+DETAIL_PATH = re.compile(r"^/v1/orgaos/(?P<cnpj>\d+)/compras/(?P<ano>\d+)/(?P<sequencial>\d+)$")
+
+# Record field each contratação filter applies to; dates are compared on their yyyy-MM-dd prefix
+FILTER_FIELDS = {
+    "uf": ("unidadeOrgao", "ufSigla"),
+    "codigoMunicipioIbge": ("unidadeOrgao", "codigoIbge"),
+    "codigoUnidadeAdministrativa": ("unidadeOrgao", "codigoUnidade"),
+    "cnpj": ("orgaoEntidade", "cnpj"),
+    "codigoModalidadeContratacao": ("modalidadeId",),
+    "codigoModoDisputa": ("modoDisputaId",),
+}
+DATE_FIELDS = {
+    "/v1/contratacoes/proposta": "dataEncerramentoProposta",
+    "/v1/contratacoes/publicacao": "dataPublicacaoPncp",
+    "/v1/contratacoes/atualizacao": "dataAtualizacaoGlobal",
+}
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock server.
+
+    Attributes:
+        latency (float): Seconds added before every response.
+        jitter (float): Extra random latency, uniform in [0, jitter] seconds.
+        error_rate (float): Fraction of requests answered with 500.
+        throttle_rate (float): Fraction of requests answered with 429.
+        max_rps (float): Requests per second allowed before answering 429
+            (token bucket with a one-second burst); 0 disables it.
+        retry_after (float): Retry-After sent with every 429, in seconds.
+        drift_every (int): Every this many page requests, ``drift_size`` new
+            records are published at the head of the result set, shifting
+            every later page as a live API does; 0 disables it.
+        drift_size (int): Records inserted by each drift.
+        seed (int): Seed of the random number generator, for repeatable runs.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    max_rps: float = 0.0
+    retry_after: float = 1.0
+    drift_every: int = 0
+    drift_size: int = 1
+    seed: int = 0
+
+
+def load_records(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Loads raw contratação records from ``contracts.pkl`` or, failing that, ``contracts.csv``.
+
+    The CSV stores nested objects as Python literals, which are parsed back.
+    """
+    if path is None:
+        pickle_path = os.path.join(DATA_DIR, "contracts.pkl")
+        path = pickle_path if os.path.exists(pickle_path) else os.path.join(DATA_DIR, "contracts.csv")
+    if path.endswith(".pkl"):
+        df = pd.read_pickle(path)
+    else:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        for column in ("orgaoEntidade", "unidadeOrgao", "amparoLegal", "orgaoSubRogado",
+                       "unidadeSubRogada", "fontesOrcamentarias"):
+            if column in df.columns:
+                df[column] = df[column].map(lambda value: ast.literal_eval(value) if value else None)
+    return [_clean_nan(record) for record in df.to_dict("records")]
+
+
+def _clean_nan(value: Any) -> Any:
+    """Replaces float NaN (which JSON cannot carry) with None, recursively."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _clean_nan(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clean_nan(item) for item in value]
+    return value
+
+
+def _field(record: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    for name in path:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(name)
+    return record
+
+
+def _iso_date(value: str) -> str:
+    """yyyyMMdd -> yyyy-MM-dd, so it compares with the ISO timestamps of the records."""
+    return f"{value[:4]}-{value[4:6]}-{value[6:8]}"
+
+
+class MockPNCP:
+    """In-memory PNCP consulta API over a list of records.
+
+    Every paginated endpoint of api-docs.json is served. The contratação
+    endpoints apply their filters and date ranges; the others (contratos,
+    atas, PCA, instrumentos de cobrança) page through the same records
+    unfiltered, which is enough to exercise the paging envelope. Records
+    are serialized once, so a page costs a slice and a join.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], config: Optional[MockConfig] = None,
+                 api_docs_path: str = API_DOCS_PATH):
+        self.config = config or MockConfig()
+        self.endpoints: Dict[str, Endpoint] = load_endpoints(api_docs_path)
+        self.records = list(records)
+        self.encoded = [json.dumps(record, ensure_ascii=False).encode("utf-8") for record in self.records]
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "drifts": 0}
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._selections: Dict[Tuple, List[int]] = {}
+        self._details: Optional[Dict[Tuple[str, int, int], int]] = None
+        self._page_requests = 0
+        self._tokens = self.config.max_rps
+        self._last_refill = time.monotonic()
+
+    def handle(self, path: str, query: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """Answers one GET; returns the status, extra headers and body."""
+        with self._lock:
+            self.stats["requests"] += 1
+            fault = self._fault()
+        if fault is not None:
+            return fault
+
+        match = DETAIL_PATH.match(path)
+        if match:
+            return self._detail(match["cnpj"], int(match["ano"]), int(match["sequencial"]))
+        endpoint = self.endpoints.get(path) or self.endpoints.get(path + "/")
+        if endpoint is None:
+            return 404, {}, _json({"message": f"No endpoint {path}"})
+        return self._page(endpoint, query)
+
+    def _fault(self) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """Injects throttling and errors; called with the lock held."""
+        config = self.config
+        if config.max_rps:
+            now = time.monotonic()
+            self._tokens = min(config.max_rps, self._tokens + (now - self._last_refill) * config.max_rps)
+            self._last_refill = now
+            if self._tokens < 1:
+                return self._throttled()
+            self._tokens -= 1
+        if config.throttle_rate and self._random.random() < config.throttle_rate:
+            return self._throttled()
+        if config.error_rate and self._random.random() < config.error_rate:
+            self.stats["errors"] += 1
+            return 500, {}, b"Internal Server Error"
+        return None
+
+    def _throttled(self) -> Tuple[int, Dict[str, str], bytes]:
+        self.stats["throttled"] += 1
+        return 429, {"Retry-After": f"{self.config.retry_after:g}"}, b"Too Many Requests"
+
+    def _page(self, endpoint: Endpoint, query: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        errors = []
+        try:
+            endpoint.validate({name: value for name, value in query.items() if name not in PAGING_PARAMS})
+        except ValueError as e:
+            errors.append(str(e))
+        page = query.get("pagina", "")
+        page_size = query.get("tamanhoPagina", "10")
+        if not page.isdigit() or int(page) < 1:
+            errors.append("pagina must be a positive integer")
+        if not page_size.isdigit() or not (
+                endpoint.min_page_size <= int(page_size) <= (endpoint.max_page_size or int(page_size))):
+            errors.append(f"tamanhoPagina must be between {endpoint.min_page_size} and {endpoint.max_page_size}")
+        if errors:
+            return 400, {}, _json({"message": "; ".join(errors)})
+
+        page, page_size = int(page), int(page_size)
+        with self._lock:
+            self._drift()
+            selection = self._select(endpoint.path, query)
+            start = (page - 1) * page_size
+            rows = [self.encoded[i] for i in selection[start:start + page_size]]
+        if not rows:
+            return 204, {}, b""
+
+        total_pages = -(-len(selection) // page_size)
+        body = b"".join([
+            b'{"data":[', b",".join(rows), b"],",
+            _json({
+                "totalRegistros": len(selection),
+                "totalPaginas": total_pages,
+                "numeroPagina": page,
+                "paginasRestantes": max(total_pages - page, 0),
+                "empty": False,
+            })[1:],
+        ])
+        return 200, {}, body
+
+    def _drift(self):
+        """Publishes new records at the head of the result set; called with the lock held."""
+        config = self.config
+        if not config.drift_every or not self.records:
+            return
+        self._page_requests += 1
+        if self._page_requests % config.drift_every:
+            return
+        for _ in range(config.drift_size):
+            record = dict(self._random.choice(self.records))
+            record["numeroControlePNCP"] = f"DRIFT-{self.stats['drifts']:06d}/{record.get('anoCompra')}"
+            self.records.insert(0, record)
+            self.encoded.insert(0, json.dumps(record, ensure_ascii=False).encode("utf-8"))
+            self.stats["drifts"] += 1
+        self._selections.clear()
+        self._details = None
+
+    def _select(self, path: str, query: Dict[str, str]) -> List[int]:
+        """Returns the indexes of the records matching a query; cached until the next drift."""
+        filters = tuple(sorted((name, value) for name, value in query.items()
+                               if name in FILTER_FIELDS or name.startswith("data")))
+        key = (path, filters)
+        selection = self._selections.get(key)
+        if selection is not None:
+            return selection
+
+        date_field = DATE_FIELDS.get(path)
+        if date_field is None:  # Not a contratação endpoint: serve everything
+            selection = list(range(len(self.records)))
+        else:
+            low = _iso_date(query["dataInicial"]) if "dataInicial" in query else ""
+            high = _iso_date(query["dataFinal"]) if "dataFinal" in query else ""
+            checks = [(FILTER_FIELDS[name], value) for name, value in filters if name in FILTER_FIELDS]
+            selection = []
+            for i, record in enumerate(self.records):
+                date = (record.get(date_field) or "")[:10]
+                if high and date > high:  # proposta: proposals closing by dataFinal
+                    continue
+                if low and date < low and path != "/v1/contratacoes/proposta":  # proposta takes no dataInicial
+                    continue
+                if all(str(_field(record, field)) == value for field, value in checks):
+                    selection.append(i)
+        self._selections[key] = selection
+        return selection
+
+    def _detail(self, cnpj: str, ano: int, sequencial: int) -> Tuple[int, Dict[str, str], bytes]:
+        with self._lock:
+            if self._details is None:
+                self._details = {
+                    (_field(record, ("orgaoEntidade", "cnpj")), record.get("anoCompra"),
+                     record.get("sequencialCompra")): i
+                    for i, record in enumerate(self.records)
+                }
+            index = self._details.get((cnpj, ano, sequencial))
+            record = self.records[index] if index is not None else None
+        if record is None:
+            return 404, {}, _json({"message": "Compra não encontrada"})
+        detail = dict(record, indicadorOrcamentoSigiloso="COMPRA_SEM_SIGILO",
+                      orcamentoSigilosoCodigo=1, orcamentoSigilosoDescricao="Compra sem sigilo",
+                      existeResultado=record.get("valorTotalHomologado") is not None)
+        return 200, {}, _json(detail)
+
+    def delay(self) -> float:
+        """Seconds to wait before answering the current request."""
+        config = self.config
+        return config.latency + (self._random.uniform(0, config.jitter) if config.jitter else 0.0)
+
+
+def _json(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the production API
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+    api: MockPNCP
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path[len(BASE_PATH):] if url.path.startswith(BASE_PATH) else url.path
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        status, headers, body = self.api.handle(path, query)
+
+        delay = self.api.delay()
+        if delay:
+            time.sleep(delay)
+        if body and "gzip" in self.headers.get("Accept-Encoding", "") and status == 200:
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        if status == 200:
+            self.send_header("Content-Type", "application/json")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(records: Optional[List[Dict[str, Any]]] = None, config: Optional[MockConfig] = None,
+                      host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts the mock server on a background thread.
+
+    Args:
+        records (list): Records to serve; loaded with ``load_records`` when omitted.
+        config (MockConfig): Latency and fault injection settings.
+        host (str): Interface to listen on.
+        port (int): Port to listen on; 0 picks a free one.
+
+    Returns:
+        The server (call ``shutdown()`` to stop it; its ``api`` attribute
+        holds the ``MockPNCP`` and its counters) and the base URL to use in
+        place of ``BASE_URL``.
+    """
+    api = MockPNCP(load_records() if records is None else records, config)
+    handler = type("MockPNCPHandler", (_Handler,), {"api": api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.api = api
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{BASE_PATH}"
+
+
+def main():
+    """Runs the mock server in the foreground."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the PNCP consulta API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", help="contracts.pkl or contracts.csv to serve")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="Requests per second before answering 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with 429, in seconds")
+    parser.add_argument("--drift-every", type=int, default=0, help="Page requests between record insertions")
+    parser.add_argument("--drift-size", type=int, default=1, help="Records inserted by each drift")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate, max_rps=args.max_rps, retry_after=args.retry_after,
+                        drift_every=args.drift_every, drift_size=args.drift_size, seed=args.seed)
+    records = load_records(args.data)
+    server, base_url = start_mock_server(records, config, args.host, args.port)
+    print(f"Serving {len(records)} records at {base_url} (set PNCP_BASE_URL to use it). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
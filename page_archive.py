@@ -0,0 +1,83 @@
+import gzip
+import json
+import threading
+import zlib
+from typing import Dict, Any, Optional, Mapping, Tuple
+from urllib.parse import urlsplit
+
+ARCHIVE_PATH = "pages.jsonl.gz"
+MISSING_STATUS = 404  # Answer to a replayed request that was never recorded
+
+
+def archive_key(url: str, params: Optional[Mapping[str, Any]] = None) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """Identifies a request by URL path and sorted parameters, so a recording replays under any host."""
+    return urlsplit(url).path, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+class PageArchive:
+    """Gzip-compressed JSONL archive of raw API responses.
+
+    Each line is ``{"url": ..., "params": {...}, "status": ..., "body": "..."}``
+    with the body as received (decoded text). While recording, lines are
+    appended to one gzip stream shared by every thread; reopening an
+    existing archive appends a new gzip member, which readers handle
+    transparently. A member cut short by a crash loses only its unflushed
+    tail.
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self.responses: Dict[Tuple, Tuple[int, bytes]] = {}
+        self.misses = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    # --- Recording ---
+    def open(self):
+        """Starts appending recorded responses to the archive."""
+        self._file = gzip.open(self.path, "ab")
+
+    def record(self, url: str, params: Optional[Mapping[str, Any]], status: int, body: bytes):
+        line = json.dumps({
+            "url": url,
+            "params": {str(k): str(v) for k, v in (params or {}).items()},
+            "status": status,
+            "body": body.decode("utf-8"),
+        }, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._file.write(line + b"\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # --- Replay ---
+    def load(self) -> int:
+        """Reads the archive into memory for replay and returns the number of responses.
+
+        A request recorded more than once replays its latest response.
+        """
+        self.responses = {}
+        try:
+            with gzip.open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # Line cut short by a crash
+                        continue
+                    key = archive_key(entry["url"], entry["params"])
+                    self.responses[key] = (entry["status"], entry["body"].encode("utf-8"))
+        except (EOFError, gzip.BadGzipFile, zlib.error):  # Truncated last member
+            pass
+        return len(self.responses)
+
+    def lookup(self, url: str, params: Optional[Mapping[str, Any]] = None) -> Tuple[int, bytes]:
+        """Returns the recorded status and body, or ``MISSING_STATUS`` and an empty body."""
+        response = self.responses.get(archive_key(url, params))
+        if response is None:
+            with self._lock:
+                self.misses += 1
+            return MISSING_STATUS, b""
+        return response
@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+from typing import Dict, Any, List, Iterator, Tuple
+
+import pandas as pd
+
+import fast_json
+from columnar import ColumnBuilder, records_to_dataframe
+
+LINE_PREFIX = re.compile(rb'^\{"page": (\d+), ')  # How ``append`` starts every line
+
+
+class RawPage(list):
+    """The records of one API page, with the response body they were parsed from.
+
+    ``PageSpool.append`` writes the body as it came instead of serializing
+    the records again. Everywhere else it is an ordinary list.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], body: bytes):
+        super().__init__(records)
+        self.body = body
+
+
+def _page_records(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return entry["data"] if "data" in entry else entry["response"]["data"]
+
+
+class PageSpool:
+    """Append-only JSONL file holding the raw records of a crawl, one page per line.
+
+    Each line is ``{"page": n, "data": [...]}``, or ``{"page": n,
+    "response": {...}}`` with the whole API response when the page was a
+    ``RawPage``. Pages are appended in the
+    order they arrive, so the writer never holds more than the page being
+    written; readers restore page order through an index of line offsets
+    built in one pass over the file. A line cut short by a crash is ignored,
+    and cut off before the first append so the next page starts on its own
+    line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._repaired = False
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def append(self, page: int, records: List[Dict[str, Any]]):
+        """Writes one page to the end of the spool."""
+        body = getattr(records, "body", None)
+        if body is not None and body[:1] == b"{" and b"\n" not in body:  # Must fit on one line as it is
+            line = b'{"page": %d, "response": %s}\n' % (page, body)
+        else:
+            line = b'{"page": %d, "data": %s}\n' % (page, fast_json.dumps(records))
+        with self._lock:
+            if not self._repaired:
+                self._truncate_partial_line()
+                self._repaired = True
+            with open(self.path, "ab") as f:
+                f.write(line)
+
+    def _truncate_partial_line(self):
+        """Cuts the file back to its last complete line, dropping what a crash left half-written."""
+        if not self.exists():
+            return
+        with open(self.path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(position - 65536, 0)
+                f.seek(start)
+                block = f.read(position - start)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                f.truncate(position)
+
+    def clear(self):
+        """Deletes the spool file."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def index(self) -> Dict[int, int]:
+        """Maps every complete page in the spool to the byte offset of its line."""
+        offsets: Dict[int, int] = {}
+        if not self.exists():
+            return offsets
+        with open(self.path, "rb") as f:
+            offset = f.tell()
+            for line in iter(f.readline, b""):
+                if line.endswith(b"\n"):
+                    prefix = LINE_PREFIX.match(line)
+                    if prefix is not None:  # Complete line written by append: no need to parse the records
+                        offsets[int(prefix.group(1))] = offset
+                    else:
+                        try:
+                            offsets[fast_json.loads(line)["page"]] = offset
+                        except (ValueError, KeyError):
+                            pass
+                offset = f.tell()
+        return offsets
+
+    def pages(self) -> List[int]:
+        """Returns the completed page numbers, sorted."""
+        return sorted(self.index())
+
+    def iter_pages(self) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Yields ``(page, records)`` in page order, reading one page at a time."""
+        offsets = self.index()
+        if not offsets:  # Also covers a spool never written to, which has no file
+            return
+        with open(self.path, "rb") as f:
+            for page in sorted(offsets):
+                f.seek(offsets[page])
+                yield page, _page_records(fast_json.loads(f.readline()))
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Yields every record in page order."""
+        for _, records in self.iter_pages():
+            yield from records
+
+    def iter_frames(self, chunk_rows: int = 10_000) -> Iterator[pd.DataFrame]:
+        """Yields the records as DataFrames of about ``chunk_rows`` rows, in page order."""
+        builder = ColumnBuilder()
+        for _, records in self.iter_pages():
+            builder.extend(records)
+            if len(builder) >= chunk_rows:
+                yield builder.to_dataframe()
+                builder.clear()
+        if len(builder):
+            yield builder.to_dataframe()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Materializes the whole spool as one DataFrame."""
+        return records_to_dataframe(records for _, records in self.iter_pages())
+
+    def to_csv(self, filename: str, chunk_rows: int = 10_000) -> int:
+        """Writes the spool to a CSV file chunk by chunk and returns the number of rows.
+
+        The header is every field of every record, in order of first
+        appearance, so a field first seen on a later page gets its own column
+        instead of being dropped. Collecting it costs one extra read of the
+        spool.
+        """
+        columns: Dict[str, None] = {}
+        for _, records in self.iter_pages():
+            for record in records:
+                if record.keys() != columns.keys():
+                    columns.update(dict.fromkeys(record))
+        header = True
+        rows = 0
+        for frame in self.iter_frames(chunk_rows):
+            frame.reindex(columns=list(columns)).to_csv(filename, index=False, header=header,
+                                                        mode="w" if header else "a")
+            header = False
+            rows += len(frame)
+        return rows
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, Optional, List
+
+API_DOCS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api-docs.json")
+PAGING_PARAMS = ("pagina", "tamanhoPagina")  # Filled in by the crawler, never by the caller
+DATE_PATTERN = re.compile(r"^\d{8}$")  # The API takes dates as yyyyMMdd
+# Field identifying a record of each schema, for dropping records returned twice by overlapping crawls
+RECORD_KEYS = {
+    "RecuperarCompraPublicacaoDTO": "numeroControlePNCP",
+    "RecuperarContratoDTO": "numeroControlePNCP",
+    "AtaRegistroPrecoPeriodoDTO": "numeroControlePNCPAta",
+}
+
+
+@dataclass
+class QueryParameter:
+    """One query parameter of an endpoint, as declared in the OpenAPI document."""
+    name: str
+    required: bool
+    type: str
+
+    @property
+    def is_date(self) -> bool:
+        return self.type == "string" and self.name.startswith("data")
+
+    def check(self, value: Any) -> Optional[str]:
+        """Returns why ``value`` is not acceptable for this parameter, or None."""
+        if self.type == "integer":
+            if isinstance(value, bool) or not (isinstance(value, int) or str(value).isdigit()):
+                return f"{self.name} must be an integer, got {value!r}"
+        elif self.is_date and not DATE_PATTERN.match(str(value)):
+            return f"{self.name} must be a yyyyMMdd date, got {value!r}"
+        return None
+
+
+@dataclass
+class Endpoint:
+    """A paginated consulta endpoint (``pagina``/``tamanhoPagina`` envelope).
+
+    ``name`` is the path without the version prefix, with slashes turned
+    into underscores (``/v1/contratos/atualizacao`` -> ``contratos_atualizacao``).
+    """
+    name: str
+    path: str
+    summary: str
+    parameters: Dict[str, QueryParameter]
+    min_page_size: int
+    max_page_size: Optional[int]
+    record_schema: Optional[str]
+
+    @property
+    def record_key(self) -> Optional[str]:
+        """Field that identifies a record, or None if the schema has no such field."""
+        return RECORD_KEYS.get(self.record_schema)
+
+    @property
+    def required_params(self) -> List[str]:
+        return [name for name, parameter in self.parameters.items()
+                if parameter.required and name not in PAGING_PARAMS]
+
+    def validate(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Checks the caller's parameters against the document.
+
+        Raises:
+            ValueError: Listing every missing, unknown or malformed parameter.
+
+        Returns:
+            The parameters, unchanged.
+        """
+        errors = [f"missing required parameter {name}" for name in self.required_params if params.get(name) is None]
+        for name, value in params.items():
+            parameter = self.parameters.get(name)
+            if parameter is None or name in PAGING_PARAMS:
+                errors.append(f"unknown parameter {name}")
+            elif value is not None:
+                error = parameter.check(value)
+                if error:
+                    errors.append(error)
+        if errors:
+            raise ValueError(f"Invalid parameters for {self.path}: {'; '.join(errors)}")
+        return params
+
+
+def endpoint_name(path: str) -> str:
+    """Derives the short dataset name of an endpoint path."""
+    return re.sub(r"^/v\d+/", "", path).strip("/").replace("/", "_")
+
+
+def _schema_name(ref: Optional[str]) -> Optional[str]:
+    return ref.rsplit("/", 1)[-1] if ref else None
+
+
+@lru_cache(maxsize=None)
+def load_endpoints(api_docs_path: str = API_DOCS_PATH) -> Dict[str, Endpoint]:
+    """Reads every paginated GET endpoint of the OpenAPI document, keyed by path."""
+    with open(api_docs_path, encoding="utf-8") as f:
+        api_docs = json.load(f)
+    schemas = api_docs.get("components", {}).get("schemas", {})
+
+    endpoints: Dict[str, Endpoint] = {}
+    for path, operations in api_docs.get("paths", {}).items():
+        operation = operations.get("get")
+        if operation is None:
+            continue
+        parameters = {
+            parameter["name"]: QueryParameter(
+                name=parameter["name"],
+                required=parameter.get("required", False),
+                type=parameter.get("schema", {}).get("type", "string"),
+            )
+            for parameter in operation.get("parameters", [])
+            if parameter.get("in") == "query"
+        }
+        if "pagina" not in parameters:
+            continue
+
+        page_size_schema = next(
+            (p.get("schema", {}) for p in operation["parameters"] if p.get("name") == "tamanhoPagina"), {})
+        page_schema = _schema_name(
+            operation.get("responses", {}).get("200", {}).get("content", {})
+            .get("*/*", {}).get("schema", {}).get("$ref"))
+        record_ref = (schemas.get(page_schema, {}).get("properties", {})
+                      .get("data", {}).get("items", {}).get("$ref"))
+
+        endpoints[path] = Endpoint(
+            name=endpoint_name(path),
+            path=path,
+            summary=operation.get("summary", ""),
+            parameters=parameters,
+            min_page_size=page_size_schema.get("minimum", 1),
+            max_page_size=page_size_schema.get("maximum"),
+            record_schema=_schema_name(record_ref),
+        )
+    return endpoints
+
+
+def get_endpoint(endpoint: str, api_docs_path: str = API_DOCS_PATH) -> Endpoint:
+    """Looks an endpoint up by path (``/v1/contratos``) or by name (``contratos``).
+
+    Raises:
+        ValueError: If the document has no paginated endpoint by that path or name.
+    """
+    endpoints = load_endpoints(api_docs_path)
+    if endpoint in endpoints:
+        return endpoints[endpoint]
+    for spec in endpoints.values():
+        if spec.name == endpoint:
+            return spec
+    names = ", ".join(sorted(spec.name for spec in endpoints.values()))
+    raise ValueError(f"Unknown endpoint {endpoint!r}; available: {names}")
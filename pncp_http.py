@@ -0,0 +1,669 @@
+import asyncio
+import atexit
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, List, Mapping, Deque
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from http_cache import CACHE_DIR, CACHE_TTL, ResponseCache
+from page_archive import ARCHIVE_PATH, MISSING_STATUS, PageArchive
+
+REQUEST_TIMEOUT = 30  # Seconds allowed for a single request
+POOL_CONNECTIONS = 4  # Number of hosts kept in the connection pool
+POOL_MAXSIZE = 32  # Keep-alive connections kept per host (should be >= concurrent workers)
+MAX_RETRIES = 5  # Retries per request after throttling, server errors or network failures
+BACKOFF_BASE = 1  # Seconds; the backoff window doubles on every retry
+BACKOFF_CAP = 60  # Longest wait between two attempts, Retry-After included
+THROTTLE_STATUSES = {429, 503}  # The server asks us to slow down
+RETRY_STATUSES = THROTTLE_STATUSES | {500, 502, 504}
+CACHEABLE_STATUSES = {200, 204}  # 204 is how PNCP answers a query with no results
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+# --- Request Timing ---
+@dataclass
+class RequestTiming:
+    """Wall-clock breakdown of one HTTP request, in seconds."""
+    url: str
+    status: int
+    connect: float  # TCP + TLS handshake; 0 when a pooled connection was reused
+    ttfb: float  # Waiting for the first response byte after the connection was ready
+    download: float  # Reading (and decompressing) the response body
+    size: int  # Decoded body size in bytes
+    wire_size: int  # Body bytes received over the network, before decompression
+
+    @property
+    def total(self) -> float:
+        return self.connect + self.ttfb + self.download
+
+    @property
+    def reused_connection(self) -> bool:
+        return self.connect == 0
+
+
+_timings: List[RequestTiming] = []
+_timings_lock = threading.Lock()
+_connect_times = threading.local()
+
+
+def record_timing(timing: RequestTiming):
+    """Stores the timing of a finished request."""
+    with _timings_lock:
+        _timings.append(timing)
+
+
+def get_request_timings() -> List[RequestTiming]:
+    """Returns a copy of the timings recorded since the last reset."""
+    with _timings_lock:
+        return list(_timings)
+
+
+def reset_request_timings():
+    """Discards all recorded timings."""
+    with _timings_lock:
+        _timings.clear()
+
+
+def timing_summary() -> Dict[str, Any]:
+    """Aggregates the recorded timings into averages and connection reuse counts."""
+    timings = get_request_timings()
+    if not timings:
+        return {"requests": 0}
+    count = len(timings)
+    new_connections = [t for t in timings if not t.reused_connection]
+    return {
+        "requests": count,
+        "new_connections": len(new_connections),
+        "avg_connect": sum(t.connect for t in new_connections) / len(new_connections) if new_connections else 0.0,
+        "avg_ttfb": sum(t.ttfb for t in timings) / count,
+        "avg_download": sum(t.download for t in timings) / count,
+        "avg_total": sum(t.total for t in timings) / count,
+        "bytes": sum(t.wire_size for t in timings),
+        "decoded_bytes": sum(t.size for t in timings),
+    }
+
+
+def print_timing_summary():
+    """Prints the aggregated request timings and, when enabled, the cache counters."""
+    if _cache is not None:
+        print(_cache.summary())
+    summary = timing_summary()
+    if not summary["requests"]:
+        return
+    print(
+        f"HTTP: {summary['requests']} requests over {summary['new_connections']} new connections, "
+        f"avg connect {summary['avg_connect'] * 1000:.0f} ms, "
+        f"avg TTFB {summary['avg_ttfb'] * 1000:.0f} ms, "
+        f"avg download {summary['avg_download'] * 1000:.0f} ms, "
+        f"{summary['bytes'] / 1_000_000:.1f} MB received ({summary['decoded_bytes'] / 1_000_000:.1f} MB decoded)"
+    )
+
+
+# --- Response Cache ---
+_cache: Optional[ResponseCache] = None
+
+
+def configure_cache(directory: str = CACHE_DIR, ttl: float = CACHE_TTL) -> ResponseCache:
+    """Serves every GET (blocking and async) through an on-disk response cache.
+
+    Args:
+        directory (str): Where cached responses are stored.
+        ttl (float): Seconds a response is reused before asking the server again.
+
+    Returns:
+        The new cache.
+    """
+    global _cache
+    _cache = ResponseCache(directory, ttl)
+    return _cache
+
+
+def disable_cache():
+    """Sends every GET to the server again."""
+    global _cache
+    _cache = None
+
+
+def get_cache() -> Optional[ResponseCache]:
+    return _cache
+
+
+# --- Record and Replay ---
+_recorder: Optional[PageArchive] = None
+_replay: Optional[PageArchive] = None
+
+
+def record_pages(path: str = ARCHIVE_PATH) -> PageArchive:
+    """Appends every successful response (blocking and async) to a compressed page archive.
+
+    The archive is closed by ``stop_recording`` or, at the latest, when the interpreter exits.
+    """
+    global _recorder
+    stop_recording()
+    _recorder = PageArchive(path)
+    _recorder.open()
+    atexit.register(stop_recording)
+    return _recorder
+
+
+def stop_recording():
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def replay_pages(path: str = ARCHIVE_PATH) -> PageArchive:
+    """Answers every GET from a recorded page archive instead of the network.
+
+    Requests missing from the archive get a 404 without being sent.
+    """
+    global _replay
+    archive = PageArchive(path)
+    print(f"Replaying {archive.load()} recorded responses from {path}.")
+    _replay = archive
+    return archive
+
+
+def stop_replay():
+    global _replay
+    _replay = None
+
+
+# --- Blocking Session (requests) ---
+def _timed_connect(connect):
+    """Wraps a urllib3 connect() so the handshake time is added to the calling thread."""
+    def wrapper(self):
+        start = time.perf_counter()
+        try:
+            return connect(self)
+        finally:
+            _connect_times.value = getattr(_connect_times, "value", 0.0) + time.perf_counter() - start
+    return wrapper
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    connect = _timed_connect(HTTPConnection.connect)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    connect = _timed_connect(HTTPSConnection.connect)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report how long their handshake took."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def configure_session(pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                      headers: Optional[Mapping[str, str]] = None) -> requests.Session:
+    """Creates the shared keep-alive session used by every blocking request.
+
+    Args:
+        pool_connections (int): Number of hosts whose connections are pooled.
+        pool_maxsize (int): Maximum keep-alive connections kept per host.
+        headers (dict): Extra headers sent with every request.
+
+    Returns:
+        The new shared session.
+    """
+    global _session
+    session = requests.Session()
+    adapter = _TimedHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        session.headers.update(headers)
+
+    with _session_lock:
+        previous, _session = _session, session
+    if previous is not None:
+        previous.close()
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the shared session, creating it with the default pool sizes on first use."""
+    with _session_lock:
+        session = _session
+    return session if session is not None else configure_session()
+
+
+def http_get(url: str, params: Optional[Dict[str, Any]] = None,
+             timeout: float = REQUEST_TIMEOUT) -> requests.Response:
+    """Performs a GET on the shared session and records its timing.
+
+    The body is read before returning, so ``response.content`` and
+    ``response.json()`` do not touch the network again. With a cache
+    configured, fresh responses are served from disk and stale ones are
+    revalidated; only requests that reach the server are timed. While
+    replaying, the response comes from the page archive instead; while
+    recording, successful responses are added to it.
+    """
+    if _replay is not None:
+        status, body = _replay.lookup(url, params)
+        response = _stored_response(url, status, {}, body)
+        response.reason = "Not in the replay archive" if status == MISSING_STATUS else "OK"
+        return response
+    response = _http_get(url, params, timeout)
+    recorder = _recorder
+    if recorder is not None and response.status_code in CACHEABLE_STATUSES:
+        recorder.record(url, params, response.status_code, response.content)
+    return response
+
+
+def _http_get(url: str, params: Optional[Dict[str, Any]], timeout: float) -> requests.Response:
+    cache = _cache
+    entry = cache.lookup(url, params) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry):
+        cache.count("hits")
+        return _stored_response(url, entry["status"], entry["headers"], cache.body(entry))
+
+    _connect_times.value = 0.0
+    start = time.perf_counter()
+    response = get_session().get(url, params=params, timeout=timeout, stream=True,
+                                 headers=cache.conditional_headers(entry) if entry is not None else None)
+    headers_at = time.perf_counter()
+    content = response.content
+    done = time.perf_counter()
+
+    connect = _connect_times.value
+    record_timing(RequestTiming(
+        url=response.url,
+        status=response.status_code,
+        connect=connect,
+        ttfb=max(headers_at - start - connect, 0.0),
+        download=done - headers_at,
+        size=len(content),
+        wire_size=response.raw.tell() if response.raw is not None else len(content),
+    ))
+
+    if cache is not None:
+        if response.status_code == 304 and entry is not None:
+            cache.refresh(url, params, entry)
+            cache.count("revalidated")
+            return _stored_response(response.url, entry["status"], entry["headers"], cache.body(entry))
+        if response.status_code in CACHEABLE_STATUSES:
+            cache.store(url, params, response.status_code, response.headers, content)
+            cache.count("misses")
+    return response
+
+
+def _stored_response(url: str, status: int, headers: Mapping[str, str], body: bytes) -> requests.Response:
+    """Builds a ``requests.Response`` from a cached or recorded response."""
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.url = url
+    response.encoding = "utf-8"
+    response._content = body
+    return response
+
+
+# --- Async Session (aiohttp) ---
+@dataclass
+class AsyncResponse:
+    """Fully read aiohttp response, detached from its connection."""
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+    url: str
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientError(f"{self.status} Error for url: {self.url}")
+
+
+async def _on_connection_create_start(session, trace_config_ctx, params):
+    trace_config_ctx.connect_start = time.perf_counter()
+
+
+async def _on_connection_create_end(session, trace_config_ctx, params):
+    timing = trace_config_ctx.trace_request_ctx
+    if timing is not None:
+        timing.connect += time.perf_counter() - trace_config_ctx.connect_start
+
+
+def create_async_session(max_concurrency: int, headers: Optional[Mapping[str, str]] = None) -> aiohttp.ClientSession:
+    """Creates an aiohttp session with a keep-alive pool sized for ``max_concurrency`` requests.
+
+    Must be called from inside a running event loop; the caller owns the session.
+    """
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    session_headers = dict(DEFAULT_HEADERS)
+    if headers:
+        session_headers.update(headers)
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=max_concurrency),
+        headers=session_headers,
+        trace_configs=[trace_config],
+    )
+
+
+async def async_http_get(session: aiohttp.ClientSession, url: str, params: Optional[Dict[str, Any]] = None,
+                         timeout: float = REQUEST_TIMEOUT) -> AsyncResponse:
+    """Performs a GET on an aiohttp session, reads the body and records its timing.
+
+    Connection times are only measured on sessions from ``create_async_session``.
+    Uses the response cache and the page archive the same way as ``http_get``.
+    """
+    if _replay is not None:
+        status, body = _replay.lookup(url, params)
+        return AsyncResponse(status, {}, body, url)
+    result = await _async_http_get(session, url, params, timeout)
+    recorder = _recorder
+    if recorder is not None and result.status in CACHEABLE_STATUSES:
+        recorder.record(url, params, result.status, result.body)
+    return result
+
+
+def _wire_size(headers: Mapping[str, str], decoded_size: int) -> int:
+    """Body size on the wire from ``Content-Length``; the decoded size when the server sent none."""
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, ValueError):
+        return decoded_size
+
+
+async def _async_http_get(session: aiohttp.ClientSession, url: str, params: Optional[Dict[str, Any]],
+                          timeout: float) -> AsyncResponse:
+    cache = _cache
+    entry = cache.lookup(url, params) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry):
+        cache.count("hits")
+        return AsyncResponse(entry["status"], entry["headers"], cache.body(entry), url)
+
+    timing = SimpleNamespace(connect=0.0)
+    start = time.perf_counter()
+    async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout),
+                           headers=cache.conditional_headers(entry) if entry is not None else None,
+                           trace_request_ctx=timing) as response:
+        headers_at = time.perf_counter()
+        body = await response.read()
+        done = time.perf_counter()
+        result = AsyncResponse(response.status, response.headers, body, str(response.url))
+
+    record_timing(RequestTiming(
+        url=result.url,
+        status=result.status,
+        connect=timing.connect,
+        ttfb=max(headers_at - start - timing.connect, 0.0),
+        download=done - headers_at,
+        size=len(body),
+        wire_size=_wire_size(result.headers, len(body)),
+    ))
+
+    if cache is not None:
+        if result.status == 304 and entry is not None:
+            cache.refresh(url, params, entry)
+            cache.count("revalidated")
+            return AsyncResponse(entry["status"], entry["headers"], cache.body(entry), result.url)
+        if result.status in CACHEABLE_STATUSES:
+            cache.store(url, params, result.status, result.headers, body)
+            cache.count("misses")
+    return result
+
+
+# --- Retries and Adaptive Concurrency ---
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on concurrent requests.
+
+    The limit starts in slow start (doubling every round trip) and, after the
+    first cut, every healthy response grows it by about one request per round
+    trip. A throttling signal (429/503, timeout, slow
+    response) or an error rate above ``max_error_rate`` cuts it by
+    ``decrease_factor``. Cuts are spaced by ``cooldown`` seconds so a burst of
+    failures from the same overload only counts once.
+
+    The same controller gates blocking callers (``slot``) and coroutines
+    (``async_slot``); a crawl should use one kind or the other.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32,
+                 decrease_factor: float = 0.5, latency_target: float = 5.0,
+                 max_error_rate: float = 0.1, window: int = 20, cooldown: float = 2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._condition = threading.Condition()
+        self._async_condition: Optional[asyncio.Condition] = None
+
+    @property
+    def concurrency(self) -> int:
+        return int(self.limit)
+
+    @contextmanager
+    def slot(self):
+        """Blocks until the current limit allows one more request in flight."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """Waits on the event loop until the current limit allows one more request."""
+        if self._async_condition is None:
+            self._async_condition = asyncio.Condition()
+        async with self._async_condition:
+            await self._async_condition.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._async_condition:
+                self.in_flight -= 1
+                self._async_condition.notify_all()
+
+    def on_success(self, latency: float):
+        """Reports a completed request and how long it took."""
+        if latency > self.latency_target:
+            self.on_throttle()
+            return
+        with self._condition:
+            self._outcomes.append(True)
+            step = 1 if self._slow_start else 1 / self.limit
+            self.limit = min(self.limit + step, self.maximum)
+            self._condition.notify_all()
+
+    def on_error(self):
+        """Reports a failed request that was not a throttling signal."""
+        self._record(False)
+        with self._condition:
+            errors = self._outcomes.count(False)
+            unhealthy = len(self._outcomes) >= 5 and errors / len(self._outcomes) > self.max_error_rate
+        if unhealthy:
+            self._decrease()
+
+    def on_throttle(self):
+        """Reports that the server is pushing back (429/503, timeout or slow response)."""
+        self._record(False)
+        self._decrease()
+
+    def _record(self, ok: bool):
+        with self._condition:
+            self._outcomes.append(ok)
+
+    def _decrease(self):
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._slow_start = False
+            self.limit = max(self.limit * self.decrease_factor, self.minimum)
+            print(f"Throttling detected; concurrency limit lowered to {self.concurrency}.")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converts a Retry-After header (seconds or HTTP date) into seconds to wait."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Seconds to wait before retry number ``attempt`` (1-based).
+
+    A server-provided Retry-After wins; otherwise exponential backoff with
+    full jitter, capped at ``BACKOFF_CAP``.
+    """
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def http_get_with_retry(url: str, params: Optional[Dict[str, Any]] = None, timeout: float = REQUEST_TIMEOUT,
+                        max_retries: int = MAX_RETRIES, controller: Optional[AIMDController] = None,
+                        retry_timeouts: bool = True) -> requests.Response:
+    """``http_get`` with backoff retries for throttling, server errors and network failures.
+
+    Returns the last response once retries are exhausted (the caller decides
+    how to handle its status) and re-raises the last network error if no
+    response was ever received. Without ``retry_timeouts``, a timeout is
+    re-raised at once, for callers that react to it by asking for less.
+    """
+    attempt = 0
+    while True:
+        retry_after = None
+        try:
+            if controller is not None:
+                with controller.slot():
+                    start = time.perf_counter()  # Time the request only, not the wait for a slot
+                    response = http_get(url, params=params, timeout=timeout)
+                    latency = time.perf_counter() - start
+            else:
+                response = http_get(url, params=params, timeout=timeout)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            if controller is not None:
+                controller.on_throttle()
+            if attempt == max_retries or (not retry_timeouts and isinstance(e, requests.exceptions.Timeout)):
+                raise
+            print(f"Request failed ({e.__class__.__name__}); retrying...")
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                if controller is not None:
+                    controller.on_success(latency)
+                return response
+            if controller is not None and response.status_code in THROTTLE_STATUSES:
+                controller.on_throttle()
+            elif controller is not None:
+                controller.on_error()
+            if attempt == max_retries:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            print(f"Server answered {response.status_code}; retrying...")
+        attempt += 1
+        time.sleep(backoff_delay(attempt, retry_after))
+
+
+async def async_http_get_with_retry(session: aiohttp.ClientSession, url: str,
+                                    params: Optional[Dict[str, Any]] = None, timeout: float = REQUEST_TIMEOUT,
+                                    max_retries: int = MAX_RETRIES,
+                                    controller: Optional[AIMDController] = None,
+                                    semaphore: Optional[asyncio.Semaphore] = None,
+                                    retry_timeouts: bool = True) -> AsyncResponse:
+    """Event-loop version of ``http_get_with_retry``.
+
+    ``semaphore`` is an optional hard cap shared between crawls; it and the
+    controller slot are only held while a request is in flight, never while
+    backing off.
+    """
+    attempt = 0
+    while True:
+        retry_after = None
+        try:
+            async with AsyncExitStack() as stack:
+                if semaphore is not None:
+                    await stack.enter_async_context(semaphore)
+                if controller is not None:
+                    await stack.enter_async_context(controller.async_slot())
+                start = time.perf_counter()  # Time the request only, not the wait for a slot
+                response = await async_http_get(session, url, params=params, timeout=timeout)
+                latency = time.perf_counter() - start
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if controller is not None:
+                controller.on_throttle()
+            if attempt == max_retries or (not retry_timeouts and isinstance(e, asyncio.TimeoutError)):
+                raise
+            print(f"Request failed ({e.__class__.__name__}); retrying...")
+        else:
+            if response.status not in RETRY_STATUSES:
+                if controller is not None:
+                    controller.on_success(latency)
+                return response
+            if controller is not None and response.status in THROTTLE_STATUSES:
+                controller.on_throttle()
+            elif controller is not None:
+                controller.on_error()
+            if attempt == max_retries:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            print(f"Server answered {response.status}; retrying...")
+        attempt += 1
+        await asyncio.sleep(backoff_delay(attempt, retry_after))
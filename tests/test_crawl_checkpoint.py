@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawl_checkpoint  # noqa: E402
+import extract  # noqa: E402
+from crawl_checkpoint import CrawlCheckpoint  # noqa: E402
+
+
+class CheckpointAgeTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        checkpoint = CrawlCheckpoint("/v1/contratos", {}, directory=self.directory, max_age=3600)
+        checkpoint.start(50, 3)
+        checkpoint.add_page(1, [{"numeroControlePNCP": "1"}])
+
+    def resume(self, seconds_later):
+        checkpoint = CrawlCheckpoint("/v1/contratos", {}, directory=self.directory, max_age=3600)
+        now = crawl_checkpoint.time.time() + seconds_later
+        with mock.patch.object(crawl_checkpoint.time, "time", return_value=now):
+            return extract._CrawlProgress(checkpoint).resume(None)
+
+    def test_recent_checkpoint_is_resumed(self):
+        self.assertEqual(self.resume(60), 50)
+
+    def test_old_checkpoint_starts_over(self):
+        self.assertIsNone(self.resume(2 * 3600))
+
+
+if __name__ == "__main__":
+    unittest.main()
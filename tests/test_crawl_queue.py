@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crawl_queue  # noqa: E402
+import extract  # noqa: E402
+from crawl_queue import CrawlQueue  # noqa: E402
+from page_spool import PageSpool  # noqa: E402
+
+ENDPOINT = "/v1/contratos"
+PARAMS = {"dataInicial": "20240101", "dataFinal": "20240131"}
+TOTAL_PAGES = 3
+
+
+def _records(page):
+    return [{"numeroControlePNCP": f"{page}-{i}"} for i in range(2)]
+
+
+class _FakeApi:
+    """Stands in for the PNCP fetch helpers, counting the pages requested."""
+
+    def __init__(self):
+        self.fetched = []
+
+    def fetch_page(self, url, params, controller=None, max_retries=None):
+        self.fetched.append(params["pagina"])
+        return _records(params["pagina"]), TOTAL_PAGES - params["pagina"], TOTAL_PAGES
+
+    def fetch_page_adaptive(self, url, params, page, page_size, min_page_size, controller=None):
+        self.fetched.append(page)
+        return _records(page)
+
+    def patch(self):
+        return mock.patch.multiple(extract, _fetch_page=self.fetch_page,
+                                   _fetch_page_adaptive=self.fetch_page_adaptive)
+
+
+class CrawlQueueTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spool_dir = tmp.name
+        self.queue = CrawlQueue(os.path.join(tmp.name, "queue.db"), lease_seconds=60, max_attempts=3)
+        self.queue.add(ENDPOINT, PARAMS, 2)
+        self.api = _FakeApi()
+
+    def run_task(self, task, worker, lost=None):
+        with self.api.patch():
+            return crawl_queue.run_task(self.queue, task, worker, self.spool_dir, max_workers=2, lost=lost)
+
+    def test_retry_after_an_attempt_that_wrote_no_page(self):
+        task = self.queue.claim("a")
+        self.queue.fail(task, "a", "network error on page 1")
+
+        task = self.queue.claim("b")
+        self.assertEqual(task.attempts, 2)
+        self.assertEqual(self.run_task(task, "b"), 2 * TOTAL_PAGES)
+
+    def test_retry_reuses_pages_of_the_earlier_attempt(self):
+        task = self.queue.claim("a")
+        PageSpool(os.path.join(self.spool_dir, task.spool_name)).append(1, _records(1))
+        self.queue.fail(task, "a", "page 2 failed")
+
+        task = self.queue.claim("b")
+        self.assertEqual(self.run_task(task, "b"), 2 * TOTAL_PAGES)
+        self.assertNotIn(1, self.api.fetched[1:])  # Only the probe for totalPaginas asks for page 1
+        self.assertEqual(sorted(self.api.fetched[1:]), [2, 3])
+
+    def test_task_fails_after_max_attempts(self):
+        for attempt in range(3):
+            task = self.queue.claim("a")
+            self.queue.fail(task, "a", "error")
+        self.assertIsNone(self.queue.claim("a"))
+        self.assertEqual(self.queue.status(), {"failed": 1})
+
+    def test_expired_lease_goes_to_another_worker(self):
+        task = self.queue.claim("a")
+        with mock.patch.object(crawl_queue.time, "time", return_value=time.time() + 61):
+            stolen = self.queue.claim("b")
+        self.assertEqual(stolen.id, task.id)
+        self.assertFalse(self.queue.heartbeat(task, "a"))
+        self.assertFalse(self.queue.complete(task, "a", 0))
+        self.assertTrue(self.queue.complete(stolen, "b", 0))
+
+    def test_lost_lease_stops_the_task(self):
+        task = self.queue.claim("a")
+        lost = threading.Event()
+        lost.set()
+        self.assertIsNone(self.run_task(task, "a", lost))
+        self.assertEqual(self.api.fetched, [1])
+        self.assertEqual(PageSpool(os.path.join(self.spool_dir, task.spool_name)).pages(), [])
+
+
+class ParseParamsTest(unittest.TestCase):
+    def test_only_integer_parameters_are_converted(self):
+        params = crawl_queue._parse_params("contratacoes_publicacao", [
+            "cnpj=00394460000141", "codigoUnidadeAdministrativa=0001", "codigoModalidadeContratacao=6",
+            "dataInicial=20240101"])
+        self.assertEqual(params, {"cnpj": "00394460000141", "codigoUnidadeAdministrativa": "0001",
+                                  "codigoModalidadeContratacao": 6, "dataInicial": "20240101"})
+
+
+if __name__ == "__main__":
+    unittest.main()
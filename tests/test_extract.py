@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract  # noqa: E402
+import pncp_http  # noqa: E402
+
+
+class CrawlShardsTest(unittest.TestCase):
+    """Merging shard or window crawls deduplicates on the endpoint's own record key."""
+
+    def crawl(self, endpoint, frames):
+        by_shard = dict(zip(("a", "b"), frames))
+        with mock.patch.object(extract, "query_all_contracts",
+                               lambda shard, max_workers, endpoint: by_shard[shard["window"]]):
+            return extract._crawl_shards([(2, {"window": "a"}), (1, {"window": "b"})], 1, 1, "threads", endpoint)
+
+    def test_atas_deduplicated_on_the_ata_key(self):
+        frames = [pd.DataFrame({"numeroControlePNCPAta": ["1", "2"], "v": [1, 1]}),
+                  pd.DataFrame({"numeroControlePNCPAta": ["2", "3"], "v": [2, 2]})]
+        df = self.crawl("/v1/atas", frames)
+        self.assertEqual(list(df["numeroControlePNCPAta"]), ["1", "2", "3"])
+        self.assertEqual(list(df["v"]), [1, 2, 2])
+
+    def test_records_without_a_key_are_kept(self):
+        frames = [pd.DataFrame({"cnpj": ["1"]}), pd.DataFrame({"cnpj": ["1"]})]
+        self.assertEqual(len(self.crawl("/v1/instrumentoscobranca/inclusao", frames)), 2)
+
+    def test_contratacoes_deduplicated_on_numero_controle(self):
+        frames = [pd.DataFrame({"numeroControlePNCP": ["1", "2"]}), pd.DataFrame({"numeroControlePNCP": ["2"]})]
+        self.assertEqual(len(self.crawl("/v1/contratacoes/publicacao", frames)), 2)
+
+
+def _response(status, page_size=0):
+    body = {"data": [{}] * page_size, "paginasRestantes": 0, "totalPaginas": 1}
+    return SimpleNamespace(status_code=status, headers={}, content=json.dumps(body).encode("utf-8"),
+                           raise_for_status=lambda: None)
+
+
+class FirstPageTest(unittest.TestCase):
+    """Page 1 only shrinks the page size for the whole crawl when the size itself seems to be the problem."""
+
+    def fetch_first_page(self, answers):
+        sizes = []
+
+        def fake_get(url, params=None, timeout=None):
+            sizes.append(params["tamanhoPagina"])
+            answer = answers.pop(0) if answers else 200
+            if isinstance(answer, Exception):
+                raise answer
+            return _response(answer, params["tamanhoPagina"])
+
+        with mock.patch.object(pncp_http, "http_get", fake_get), \
+                mock.patch.object(pncp_http, "backoff_delay", lambda attempt, retry_after=None: 0):
+            _, page_size = extract._fetch_first_page("http://test", {}, 50, 10)
+        return page_size, sizes
+
+    def test_throttled_first_page_is_retried_at_the_same_size(self):
+        self.assertEqual(self.fetch_first_page([429, 500]), (50, [50, 50, 50]))
+
+    def test_timeout_backs_off_to_a_smaller_page(self):
+        self.assertEqual(self.fetch_first_page([requests.exceptions.ReadTimeout()]), (25, [50, 25]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_cache  # noqa: E402
+from http_cache import ResponseCache  # noqa: E402
+
+URL = "http://test/v1/contratos"
+
+
+class PruneTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = ResponseCache(tmp.name, ttl=60)
+
+    def bodies(self):
+        return sorted(name for _, _, names in os.walk(os.path.join(self.cache.directory, "bodies")) for name in names)
+
+    def test_overwritten_body_is_removed(self):
+        self.cache.store(URL, {"pagina": 1}, 200, {}, b'{"data": [1]}')
+        entry = self.cache.store(URL, {"pagina": 1}, 200, {}, b'{"data": [2]}')
+
+        with mock.patch.object(http_cache.time, "time", return_value=time.time() + 1):
+            self.assertEqual(self.cache.prune(), {"entries": 0, "bodies": 1})
+        self.assertEqual(self.bodies(), [f"{entry['body']}.gz"])
+        self.assertEqual(self.cache.body(self.cache.lookup(URL, {"pagina": 1})), b'{"data": [2]}')
+
+    def test_old_entries_and_their_bodies_are_removed(self):
+        self.cache.store(URL, {"pagina": 1}, 200, {}, b'{"data": [1]}')
+        self.cache.store(URL, {"pagina": 2}, 200, {}, b'{"data": [1]}')  # Shares the body
+        self.cache.store(URL, {"pagina": 3}, 200, {}, b'{"data": [3]}')
+        with mock.patch.object(http_cache.time, "time", return_value=time.time() + 1000):
+            self.cache.store(URL, {"pagina": 3}, 200, {}, b'{"data": [3]}')
+            self.assertEqual(self.cache.prune(max_age=500), {"entries": 2, "bodies": 1})
+        self.assertIsNone(self.cache.lookup(URL, {"pagina": 1}))
+        self.assertIsNotNone(self.cache.lookup(URL, {"pagina": 3}))
+        self.assertEqual(len(self.bodies()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import csv
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_spool import PageSpool, RawPage  # noqa: E402
+
+
+class ToCsvTest(unittest.TestCase):
+    def test_field_first_seen_in_a_later_chunk_is_written(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spool = PageSpool(os.path.join(tmp, "pages.jsonl"))
+            spool.append(1, [{"id": 1, "valor": 10}])
+            spool.append(2, [{"id": 2, "valor": 20, "novo": "x"}])
+            filename = os.path.join(tmp, "out.csv")
+
+            rows = spool.to_csv(filename, chunk_rows=1)
+
+            with open(filename, newline="") as f:
+                written = list(csv.DictReader(f))
+        self.assertEqual(rows, 2)
+        self.assertEqual([row["novo"] for row in written], ["", "x"])
+        self.assertEqual(list(written[0]), ["id", "valor", "novo"])
+
+
+class RawPageTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spool = PageSpool(os.path.join(tmp.name, "pages.jsonl"))
+
+    def test_response_body_is_spooled_as_it_came(self):
+        body = '{"data":[{"id":1,"nome":"São Paulo"}],"totalPaginas":2,"paginasRestantes":1}'.encode("utf-8")
+        self.spool.append(2, RawPage([{"id": 1, "nome": "São Paulo"}], body))
+        self.spool.append(1, [{"id": 0, "nome": None}])
+
+        with open(self.spool.path, "rb") as f:
+            self.assertIn(body, f.read())
+        self.assertEqual(list(self.spool.iter_pages()),
+                         [(1, [{"id": 0, "nome": None}]), (2, [{"id": 1, "nome": "São Paulo"}])])
+
+    def test_multiline_body_is_serialized_again(self):
+        self.spool.append(1, RawPage([{"id": 1}], b'{\n  "data": [{"id": 1}]\n}'))
+        self.assertEqual(list(self.spool.iter_pages()), [(1, [{"id": 1}])])
+
+
+if __name__ == "__main__":
+    unittest.main()
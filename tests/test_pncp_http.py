@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pncp_http  # noqa: E402
+from pncp_http import AIMDController  # noqa: E402
+
+REQUEST_SECONDS = 0.05
+LATENCY_TARGET = 0.2  # Above one request, far below the wait at the back of the queue
+QUEUED = 40  # 10 rounds of 4: the last requests wait ~0.45s for a slot
+
+
+def _controller() -> AIMDController:
+    return AIMDController(initial=4, maximum=4, latency_target=LATENCY_TARGET, cooldown=0.0)
+
+
+class QueuedLatencyTest(unittest.TestCase):
+    """Time spent waiting for a controller slot must not count as server latency."""
+
+    def test_blocking_requests_queued_behind_the_limit(self):
+        def fake_get(url, params=None, timeout=None):
+            time.sleep(REQUEST_SECONDS)
+            return SimpleNamespace(status_code=200, headers={})
+
+        controller = _controller()
+        with mock.patch.object(pncp_http, "http_get", fake_get), ThreadPoolExecutor(QUEUED) as pool:
+            list(pool.map(lambda _: pncp_http.http_get_with_retry("http://test", controller=controller),
+                          range(QUEUED)))
+        self.assertEqual(controller.concurrency, 4)
+
+    def test_async_requests_queued_behind_the_limit(self):
+        async def fake_get(session, url, params=None, timeout=None):
+            await asyncio.sleep(REQUEST_SECONDS)
+            return pncp_http.AsyncResponse(status=200, headers={}, body=b"", url=url)
+
+        async def crawl(controller):
+            semaphore = asyncio.Semaphore(QUEUED)
+            await asyncio.gather(*(
+                pncp_http.async_http_get_with_retry(None, "http://test", controller=controller,
+                                                    semaphore=semaphore)
+                for _ in range(QUEUED)))
+
+        controller = _controller()
+        with mock.patch.object(pncp_http, "async_http_get", fake_get):
+            asyncio.run(crawl(controller))
+        self.assertEqual(controller.concurrency, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()